@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Lesson
+from .models import Lesson, LessonClickDaily
 
-admin.site.register(Lesson)
\ No newline at end of file
+admin.site.register(Lesson)
+admin.site.register(LessonClickDaily)
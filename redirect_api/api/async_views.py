@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import NotFound, ValidationError
+
+from .catalog import aget_snapshot, asnapshot_key, astore_snapshot, build_snapshot, catalog_variant, snapshot_response
+from .caching import acatalog_validators, catalog_not_modified, redirect_response
+from .clicks import click_recorder
+from .models import Lesson
+from .pagination import LessonCursorPagination
+from .redirects import url_resolver
+from .serializers import LessonSerializer, parse_fields
+from .utils import NOT_FOUND_DATA
+
+
+# DRF の JSONRenderer と同じく非ASCII文字をエスケープしない
+_JSON_PARAMS = {'ensure_ascii': False}
+
+
+async def lesson_redirect_async(request: HttpRequest, pk: str) -> HttpResponse:
+    """lesson_redirect の非同期版。ワーカースレッドを占有しない"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    redirect = await url_resolver.aresolve(pk)
+    if redirect is None:
+        return JsonResponse(NOT_FOUND_DATA, status=404, json_dumps_params=_JSON_PARAMS)
+    click_recorder.record(pk, redirect.period.code, request.headers.get('Referer'))
+    return redirect_response(request, redirect)
+
+
+async def lesson_list_async(request: HttpRequest) -> HttpResponse:
+    """LessonViewSet.list の非同期版。レスポンス本文・条件付きGETの挙動は同じ"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+    paginator = LessonCursorPagination()
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        # キャッシュのキー・ETag は受け付けるパラメータだけから作る
+        variant = catalog_variant(request, paginator, fields)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400, json_dumps_params=_JSON_PARAMS)
+    except NotFound:
+        return JsonResponse(NOT_FOUND_DATA, status=404, json_dumps_params=_JSON_PARAMS)
+
+    key = await asnapshot_key(request, variant)
+    snapshot = await aget_snapshot(key)
+    if snapshot is not None:
+        return snapshot_response(request, snapshot)
+
+    etag, last_modified = await acatalog_validators(variant)
+    not_modified = catalog_not_modified(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    queryset = Lesson.objects.only(*(fields or LessonSerializer.Meta.fields))
+    lessons = await paginator.apaginate_queryset(queryset, request)
+
+    data = LessonSerializer(lessons, many=True, fields=fields).data
+    snapshot = build_snapshot(paginator.get_paginated_response_data(data), etag, last_modified)
+    await astore_snapshot(key, snapshot)
+    return snapshot_response(request, snapshot)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db.models import Count, Max
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+
+from .models import Lesson
+from .redirects import ResolvedRedirect, url_resolver
+
+
+def redirect_cache_headers(redirect: ResolvedRedirect, moment: Optional[datetime] = None) -> List[Tuple[str, str]]:
+    """リダイレクトを次のクーポン期間の境界までキャッシュさせるヘッダ"""
+    moment = moment or timezone.now()
+    # 解決済みの期間と同じ期間(リゾルバが保持しているもの)の終わりまで
+    remaining = url_resolver.period(moment).end - moment
+    max_age = max(0, int(remaining.total_seconds()))
+    return [
+        ('Cache-Control', f'public, max-age={max_age}'),
+        ('Expires', redirect.expires),
+        ('ETag', redirect.etag),
+        ('Last-Modified', redirect.last_modified),
+    ]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match ヘッダが etag に一致するか(弱い比較)"""
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    if '*' in etags:
+        return True
+    return etag.removeprefix('W/') in (e.removeprefix('W/') for e in etags)
+
+
+def redirect_response(request: HttpRequest, redirect: ResolvedRedirect) -> HttpResponse:
+    """キャッシュ用ヘッダ付きのリダイレクト。条件付きGETが一致すれば304を返す
+
+    get_conditional_response は2xx以外を対象外とするため、ETagの比較は自前で行う。
+    """
+    response: HttpResponse
+    if request.method in ('GET', 'HEAD') and etag_matches(request.headers.get('If-None-Match'), redirect.etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponseRedirect(redirect.url)
+    for header, value in redirect_cache_headers(redirect):
+        response[header] = value
+    return response
+
+
+def catalog_validators(variant: str = '') -> Tuple[Optional[str], Optional[datetime]]:
+    """一覧用の (ETag, Last-Modified)。件数を含めて削除も検知する
+
+    variant には正規化したパラメータ(catalog_variant)を渡す(ページ・fields ごとに別のETagにする)。
+    """
+    aggregated = Lesson.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    return _catalog_validators(aggregated, variant)
+
+
+async def acatalog_validators(variant: str = '') -> Tuple[Optional[str], Optional[datetime]]:
+    aggregated = await Lesson.objects.aaggregate(latest=Max('updated_at'), count=Count('id'))
+    return _catalog_validators(aggregated, variant)
+
+
+def _catalog_validators(aggregated: dict, variant: str) -> Tuple[Optional[str], Optional[datetime]]:
+    latest = aggregated['latest']
+    if latest is None:
+        return None, None
+    suffix = f'-{zlib.crc32(variant.encode("utf-8")):08x}' if variant else ''
+    return f'"{aggregated["count"]}-{latest.timestamp():.6f}{suffix}"', latest
+
+
+def catalog_not_modified(request: HttpRequest, etag: Optional[str], last_modified: Optional[datetime]) -> Optional[HttpResponse]:
+    """一覧が変わっていなければ304を返す。変わっていれば None"""
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+
+
+def set_catalog_validators(response: HttpResponse, etag: Optional[str], last_modified: Optional[datetime]) -> HttpResponse:
+    if etag is not None:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
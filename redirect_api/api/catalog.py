@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime
+from typing import Any, NamedTuple, Optional, Sequence
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+
+from .caching import catalog_not_modified, set_catalog_validators
+from .pagination import LessonCursorPagination
+from .redirects import redirect_table
+from .renderers import ORJSONRenderer
+
+
+CATALOG_CACHE_PREFIX = 'api:lesson_catalog'
+# スナップショット専用のキャッシュ。リダイレクト表のバージョンスタンプ(default)を
+# 一覧のエントリが押し出さないように分ける(未定義なら default を使用)
+CATALOG_CACHE_ALIAS = 'lesson_catalog'
+
+_renderer = ORJSONRenderer()
+
+
+class CatalogSnapshot(NamedTuple):
+    """一覧レスポンスの描画済みJSONとその検証子"""
+
+    etag: Optional[str]
+    last_modified: Optional[datetime]
+    body: bytes
+
+
+def _timeout() -> Optional[int]:
+    return getattr(settings, 'LESSON_CATALOG_CACHE_TIMEOUT', 86400)
+
+
+def _cache():
+    alias = getattr(settings, 'LESSON_CATALOG_CACHE_ALIAS', CATALOG_CACHE_ALIAS)
+    return caches[alias if alias in settings.CACHES else 'default']
+
+
+def catalog_variant(
+    request: HttpRequest, paginator: LessonCursorPagination, fields: Optional[Sequence[str]]
+) -> str:
+    """一覧の応答を変えるパラメータ(カーソル・件数・fields)を正規化したもの。
+
+    それ以外のパラメータは含めないため、追跡用パラメータ等ではキャッシュのキーもETagも変わらない。
+    paginator にはリンクに引き継ぐ fields も設定する。不正な値は NotFound / ValidationError。
+    """
+    paginator.link_params = [('fields', ','.join(fields))] if fields else []
+    return urlencode(sorted(paginator.canonical_params(request) + list(paginator.link_params)))
+
+
+def _key(request: HttpRequest, variant: str, version: Optional[str]) -> str:
+    # ページのリンクは絶対URLのため、ホスト名もキーに含める
+    digest = hashlib.md5(f'{request.get_host()}?{variant}'.encode('utf-8')).hexdigest()
+    return f'{CATALOG_CACHE_PREFIX}:{version}:{digest}'
+
+
+def snapshot_key(request: HttpRequest, variant: str) -> str:
+    """Lesson の版とパラメータごとのキー。Lesson が変われば(シグナルで版が変わり)別のキーになる"""
+    redirect_table.ensure_fresh()
+    return _key(request, variant, redirect_table.version)
+
+
+async def asnapshot_key(request: HttpRequest, variant: str) -> str:
+    await redirect_table.aensure_fresh()
+    return _key(request, variant, redirect_table.version)
+
+
+def build_snapshot(data: Any, etag: Optional[str], last_modified: Optional[datetime]) -> CatalogSnapshot:
+    return CatalogSnapshot(etag=etag, last_modified=last_modified, body=_renderer.render(data))
+
+
+def get_snapshot(key: str) -> Optional[CatalogSnapshot]:
+    return _cache().get(key)
+
+
+async def aget_snapshot(key: str) -> Optional[CatalogSnapshot]:
+    return await _cache().aget(key)
+
+
+def store_snapshot(key: str, snapshot: CatalogSnapshot) -> None:
+    _cache().set(key, snapshot, _timeout())
+
+
+async def astore_snapshot(key: str, snapshot: CatalogSnapshot) -> None:
+    await _cache().aset(key, snapshot, _timeout())
+
+
+def snapshot_response(request: HttpRequest, snapshot: CatalogSnapshot) -> HttpResponse:
+    """スナップショットをそのまま返す。検証子が一致すれば304"""
+    not_modified = catalog_not_modified(request, snapshot.etag, snapshot.last_modified)
+    if not_modified is not None:
+        return not_modified
+    response = HttpResponse(snapshot.body, content_type=_renderer.media_type)
+    return set_catalog_validators(response, snapshot.etag, snapshot.last_modified)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from typing import Deque, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import LessonClickEvent
+
+
+logger = logging.getLogger(__name__)
+
+# (lesson id, クーポンコード, UNIX時刻, リファラ)
+ClickRecord = Tuple[str, str, float, str]
+
+REFERRER_MAX_LENGTH = LessonClickEvent._meta.get_field('referrer').max_length
+
+
+class ClickRecorder:
+    """リダイレクトのクリックをプロセス内のリングバッファに貯め、別スレッドで一括保存する。
+
+    record() はタプルを deque に追加するだけで、保存処理を待たない。
+    バッファが満杯の場合は古いイベントから捨てる(リダイレクトの遅延を優先)。
+    保存は flush_size 件に達したとき、または flush_interval 秒ごとに行う。
+    """
+
+    def __init__(self) -> None:
+        self._buffer: Deque[ClickRecord] = deque(maxlen=self._setting('LESSON_CLICK_BUFFER_SIZE', 10000))
+        self._flush_size = self._setting('LESSON_CLICK_FLUSH_SIZE', 500)
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    @staticmethod
+    def _setting(name: str, default):
+        return getattr(settings, name, default)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._setting('LESSON_CLICK_TRACKING', True))
+
+    def record(self, pk: str, coupon_code: str, referrer: Optional[str]) -> None:
+        if not self.enabled:
+            return
+        self._buffer.append((pk, coupon_code, time.time(), referrer or ''))
+        if self._thread is None:
+            self._start()
+        if len(self._buffer) >= self._flush_size:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def flush(self) -> int:
+        """バッファの内容を bulk_create で保存し、保存件数を返す"""
+        with self._flush_lock:
+            records: List[ClickRecord] = []
+            try:
+                while True:
+                    records.append(self._buffer.popleft())
+            except IndexError:
+                pass
+            if not records:
+                return 0
+
+            events = [
+                LessonClickEvent(
+                    lesson_id=pk,
+                    coupon_code=coupon_code,
+                    clicked_at=datetime.fromtimestamp(clicked_at, tz=dt_timezone.utc),
+                    referrer=referrer[:REFERRER_MAX_LENGTH],
+                )
+                for pk, coupon_code, clicked_at, referrer in records
+            ]
+            try:
+                LessonClickEvent.objects.bulk_create(events, batch_size=500)
+            except Exception:
+                # 保存に失敗してもリダイレクトには影響させない
+                logger.exception('クリックログの保存に失敗しました (%d件)', len(events))
+                return 0
+            return len(events)
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='lesson-click-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self) -> None:
+        interval = float(self._setting('LESSON_CLICK_FLUSH_INTERVAL', 5.0))
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.flush()
+            # 保存専用スレッドのDB接続はリクエストと同様に毎回後始末する
+            close_old_connections()
+
+
+click_recorder = ClickRecorder()
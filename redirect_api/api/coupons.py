@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from django.utils import timezone
+
+
+# 月初からこの日以降は後半期間(クーポン日付は11日)
+SECOND_PERIOD_START_DAY = 6
+
+
+@dataclass(frozen=True)
+class CouponPeriod:
+    """クーポンコードの日付部分が一定である期間 [start, end)"""
+
+    start: datetime
+    end: datetime
+    code: str
+
+    def contains(self, moment: datetime) -> bool:
+        return self.start <= moment < self.end
+
+
+def coupon_period(moment: Optional[datetime] = None) -> CouponPeriod:
+    """moment を含むクーポン期間を返す。未指定時は現在時刻(TIME_ZONE基準)
+
+    1日〜5日は YYYYMM01、6日〜月末は YYYYMM11 を使用する。
+    """
+    local = timezone.localtime(moment)
+    month_start = local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    boundary = month_start.replace(day=SECOND_PERIOD_START_DAY)
+    if local < boundary:
+        return CouponPeriod(start=month_start, end=boundary, code=month_start.strftime('%Y%m') + '01')
+
+    if month_start.month == 12:
+        next_month = month_start.replace(year=month_start.year + 1, month=1)
+    else:
+        next_month = month_start.replace(month=month_start.month + 1)
+    return CouponPeriod(start=boundary, end=next_month, code=month_start.strftime('%Y%m') + '11')
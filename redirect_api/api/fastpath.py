@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+from typing import Callable, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core import signals
+from django.http import HttpRequest, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.http.request import split_domain_port, validate_host
+from django.utils.encoding import iri_to_uri
+from django.views.decorators.http import require_safe
+
+from .clicks import click_recorder
+from .caching import etag_matches, redirect_cache_headers, redirect_response
+from .redirects import url_resolver
+from .utils import NOT_FOUND_DATA
+
+
+# DRF DefaultRouter の詳細ルートと同じ pk の書式
+LESSON_PK_PATTERN = r'(?P<pk>[^/.]+)'
+LESSON_PATH_RE = re.compile(r'^/api/lesson/' + LESSON_PK_PATTERN + r'/$')
+
+_NOT_FOUND_BODY = json.dumps(NOT_FOUND_DATA, ensure_ascii=False).encode('utf-8')
+_ALLOWED_SCHEMES = HttpResponseRedirect.allowed_schemes
+
+StartResponse = Callable[[str, List[Tuple[str, str]]], object]
+
+logger = logging.getLogger(__name__)
+
+
+def _host_allowed(environ: dict) -> bool:
+    """HttpRequest.get_host() と同じ規則で Host ヘッダを ALLOWED_HOSTS と照合する"""
+    if settings.USE_X_FORWARDED_HOST and 'HTTP_X_FORWARDED_HOST' in environ:
+        host = environ['HTTP_X_FORWARDED_HOST']
+    elif 'HTTP_HOST' in environ:
+        host = environ['HTTP_HOST']
+    else:
+        host = environ.get('SERVER_NAME', '')
+        port = str(environ.get('SERVER_PORT', ''))
+        if port and port != ('443' if environ.get('wsgi.url_scheme') == 'https' else '80'):
+            host = f'{host}:{port}'
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    domain, _ = split_domain_port(host)
+    return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+@require_safe
+def lesson_redirect(request: HttpRequest, pk: str) -> HttpResponse:
+    """DRFを経由しないリダイレクトビュー。URL・404の挙動は LessonViewSet.retrieve と同じ"""
+    redirect = url_resolver.resolve(pk)
+    if redirect is None:
+        return JsonResponse(NOT_FOUND_DATA, status=404, json_dumps_params={'ensure_ascii': False})
+    click_recorder.record(pk, redirect.period.code, request.headers.get('Referer'))
+    return redirect_response(request, redirect)
+
+
+class LessonRedirectWSGIApp:
+    """/api/lesson/<pk>/ への GET/HEAD をミドルウェアより手前で処理するWSGIラッパー。
+
+    レスポンスはリクエストヘッダ(Cookie等)に依存しないため、
+    セッション/CSRF/認証ミドルウェアを通さなくても安全。Host は ALLOWED_HOSTS と照合する。
+    それ以外のリクエスト・高速パスで例外が起きたリクエストはそのまま Django のアプリケーションへ渡す。
+    """
+
+    def __init__(self, application: Callable[..., Iterable[bytes]]) -> None:
+        self.application = application
+
+    def __call__(self, environ: dict, start_response: StartResponse) -> Iterable[bytes]:
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            match = LESSON_PATH_RE.match(environ.get('PATH_INFO', ''))
+            # 許可されていない Host は Django 側で 400 にする
+            if match and _host_allowed(environ):
+                response = self._respond_with_signals(match.group('pk'), environ, start_response)
+                if response is not None:
+                    return response
+        return self.application(environ, start_response)
+
+    def _respond_with_signals(self, pk: str, environ: dict, start_response: StartResponse) -> Optional[Iterable[bytes]]:
+        # WSGIHandler と同じくリクエストの前後でシグナルを送り、古いDB接続を閉じる
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        try:
+            return self.respond(pk, environ, start_response)
+        except Exception:
+            # 500 の応答・django.request へのログは Django 側の処理に任せる
+            logger.warning('fast path failed for lesson %s; falling back to Django', pk, exc_info=True)
+            return None
+        finally:
+            signals.request_finished.send(sender=self.__class__)
+
+    def respond(self, pk: str, environ: dict, start_response: StartResponse) -> Optional[Iterable[bytes]]:
+        redirect = url_resolver.resolve(pk)
+        if redirect is None:
+            start_response('404 Not Found', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(_NOT_FOUND_BODY))),
+            ])
+            return [b''] if environ.get('REQUEST_METHOD') == 'HEAD' else [_NOT_FOUND_BODY]
+
+        location = iri_to_uri(redirect.url)
+        scheme = urlsplit(location).scheme
+        if scheme and scheme not in _ALLOWED_SCHEMES:
+            # 不正なスキームは Django 側に任せ、従来通りのエラー処理とする
+            return None
+
+        headers = redirect_cache_headers(redirect)
+        not_modified = etag_matches(environ.get('HTTP_IF_NONE_MATCH'), redirect.etag)
+        # 失敗時に Django 側で処理し直すため、start_response より前の処理を先に済ませる
+        click_recorder.record(pk, redirect.period.code, environ.get('HTTP_REFERER'))
+        if not_modified:
+            start_response('304 Not Modified', headers)
+            return [b'']
+        start_response('302 Found', [
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('Location', location),
+            ('Content-Length', '0'),
+            *headers,
+        ])
+        return [b'']
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import io
+import statistics
+import time
+from typing import Callable, Dict, Iterable, List
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+
+from api.fastpath import LessonRedirectWSGIApp
+from api.models import Lesson
+from api.views import LessonViewSet
+
+
+def _drf_urlconf() -> type:
+    """高速パス導入前と同じ、DRFルーターのみのURL構成"""
+    router = DefaultRouter()
+    router.register('lesson', LessonViewSet, basename='lesson')
+    return type('DrfUrlconf', (), {'urlpatterns': [path('api/', include(router.urls))]})
+
+
+def _environ(path_info: str) -> Dict[str, object]:
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path_info,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': io.StringIO(),
+    }
+
+
+class Command(BaseCommand):
+    help = 'レッスンリダイレクトの処理経路(DRF / Djangoビュー / WSGI高速パス)のレイテンシを比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pk', dest='pk', help='対象のLesson id。未指定時は先頭のLesson')
+        parser.add_argument('--requests', dest='requests', type=int, default=2000, help='経路ごとのリクエスト数')
+
+    def handle(self, *args, **options):
+        pk = options.get('pk') or Lesson.objects.order_by('id').values_list('id', flat=True).first()
+        if not pk:
+            raise CommandError('Lessonがありません。先に create_lessons を実行してください。')
+        count = max(1, int(options['requests']))
+        path_info = f'/api/lesson/{pk}/'
+
+        handler = WSGIHandler()
+        paths: Dict[str, Callable[..., Iterable[bytes]]] = {
+            'drf': handler,
+            'django': handler,
+            'wsgi': LessonRedirectWSGIApp(handler),
+        }
+
+        self.stdout.write(f'[bench_lesson_redirect] path={path_info} requests={count}')
+        for name, app in paths.items():
+            urlconf = _drf_urlconf() if name == 'drf' else 'redirect_api.urls'
+            with override_settings(ROOT_URLCONF=urlconf, DEBUG=False, LESSON_CLICK_TRACKING=False):
+                samples = self._run(app, path_info, count)
+            self._report(name, samples)
+
+    def _run(self, app: Callable[..., Iterable[bytes]], path_info: str, count: int) -> List[float]:
+        statuses: List[str] = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(status)
+
+        # ウォームアップ(リダイレクト表の構築など)
+        for _ in range(min(50, count)):
+            list(app(_environ(path_info), start_response))
+        if not statuses[-1].startswith('302'):
+            raise CommandError(f'リダイレクトされませんでした: {statuses[-1]}')
+
+        samples: List[float] = []
+        for _ in range(count):
+            environ = _environ(path_info)
+            started = time.perf_counter()
+            body = app(environ, start_response)
+            for _chunk in body:
+                pass
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    def _report(self, name: str, samples: List[float]) -> None:
+        ordered = sorted(samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        mean = statistics.fmean(samples)
+        self.stdout.write(
+            f'{name:>6}: mean={mean * 1e6:8.1f}us p99={p99 * 1e6:8.1f}us req/s={1 / mean:10.0f}'
+        )
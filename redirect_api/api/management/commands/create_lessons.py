@@ -1,39 +1,137 @@
-from django.core.management.base import BaseCommand
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from api.models import Lesson
+from api.signals import invalidate_lesson_caches
+
+# 組み込みのレッスン一覧(--file 未指定時に使用)
+LESSONS_DATA = [
+    {'id': 'U01', 'title': 'Flask', 'url': 'https://www.udemy.com/course/flaskpythonweb/?couponCode=yyyymmdd_NM_FLASK'},
+    {'id': 'U02', 'title': 'Linuxマスター', 'url': 'https://www.udemy.com/course/linuxlpic/?couponCode=yyyymmdd_NM_LINUX'},
+    {'id': 'U03', 'title': 'ITパスポート', 'url': 'https://www.udemy.com/course/it-it-sf/?couponCode=yyyymmdd_NM_ITPASS'},
+    {'id': 'U04', 'title': '基本情報', 'url': 'https://www.udemy.com/course/kihonjoho-oyojoho/?couponCode=yyyymmdd_NM_KIJO'},
+    {'id': 'U05', 'title': 'Python', 'url': 'https://www.udemy.com/course/python-python/?couponCode=yyyymmdd_NM_PYTHON'},
+    {'id': 'U06', 'title': 'デザインパターン', 'url': 'https://www.udemy.com/course/python-mx/?couponCode=yyyymmdd_NM_DESIGN'},
+    {'id': 'U07', 'title': 'Django', 'url': 'https://www.udemy.com/course/python-django-web/?couponCode=yyyymmdd_NM_DJANGO'},
+    {'id': 'U08', 'title': 'Shell', 'url': 'https://www.udemy.com/course/30awslinux/?couponCode=yyyymmdd_NM_A_LINUX'},
+    {'id': 'U09', 'title': 'SQL', 'url': 'https://www.udemy.com/course/3sqlmysql/?couponCode=yyyymmdd_NM_SQL'},
+    {'id': 'U10', 'title': 'Django Rest', 'url': 'https://www.udemy.com/course/django-restful-apigraphqlapi/?couponCode=yyyymmdd_NM_D_REST'},
+    {'id': 'U11', 'title': '生成AI', 'url': 'https://www.udemy.com/course/2024-aichatgpt-github-copilot/?couponCode=yyyymmdd_NM_GPT'},
+]
+
+# 同期対象の項目。ファイルに無い項目は既存の値を維持する
+SYNC_FIELDS = ('title', 'description', 'url', 'image_url', 'default_url')
+
 
 class Command(BaseCommand):
-    help = 'Create initial lesson data'
+    help = 'Create or sync lesson data (insert, update and optionally delete)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            dest='file',
+            help='レッスン一覧のJSON/CSVファイル。未指定時は組み込みの一覧を使用',
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            dest='delete',
+            help='一覧に無い既存レッスンを削除する',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            dest='dry_run',
+            help='変更せずに差分のみ表示',
+        )
 
     def handle(self, *args, **options):
-        lessons_data = [
-            {'id': 'U01', 'title': 'Flask', 'url': 'https://www.udemy.com/course/flaskpythonweb/?couponCode=yyyymmdd_NM_FLASK'},
-            {'id': 'U02', 'title': 'Linuxマスター', 'url': 'https://www.udemy.com/course/linuxlpic/?couponCode=yyyymmdd_NM_LINUX'},
-            {'id': 'U03', 'title': 'ITパスポート', 'url': 'https://www.udemy.com/course/it-it-sf/?couponCode=yyyymmdd_NM_ITPASS'},
-            {'id': 'U04', 'title': '基本情報', 'url': 'https://www.udemy.com/course/kihonjoho-oyojoho/?couponCode=yyyymmdd_NM_KIJO'},
-            {'id': 'U05', 'title': 'Python', 'url': 'https://www.udemy.com/course/python-python/?couponCode=yyyymmdd_NM_PYTHON'},
-            {'id': 'U06', 'title': 'デザインパターン', 'url': 'https://www.udemy.com/course/python-mx/?couponCode=yyyymmdd_NM_DESIGN'},
-            {'id': 'U07', 'title': 'Django', 'url': 'https://www.udemy.com/course/python-django-web/?couponCode=yyyymmdd_NM_DJANGO'},
-            {'id': 'U08', 'title': 'Shell', 'url': 'https://www.udemy.com/course/30awslinux/?couponCode=yyyymmdd_NM_A_LINUX'},
-            {'id': 'U09', 'title': 'SQL', 'url': 'https://www.udemy.com/course/3sqlmysql/?couponCode=yyyymmdd_NM_SQL'},
-            {'id': 'U10', 'title': 'Django Rest', 'url': 'https://www.udemy.com/course/django-restful-apigraphqlapi/?couponCode=yyyymmdd_NM_D_REST'},
-            {'id': 'U11', 'title': '生成AI', 'url': 'https://www.udemy.com/course/2024-aichatgpt-github-copilot/?couponCode=yyyymmdd_NM_GPT'},
-        ]
-
-        for lesson_data in lessons_data:
-            lesson, created = Lesson.objects.get_or_create(
-                id=lesson_data['id'],
-                defaults={
-                    'title': lesson_data['title'],
-                    'url': lesson_data['url'],
-                    'default_url': lesson_data['url']  # default_urlにも同じURLを設定
-                }
+        records = self._load(options.get('file'))
+        delete = bool(options.get('delete'))
+        dry_run = bool(options.get('dry_run'))
+
+        # 既存行を1クエリで取得して差分を計算
+        existing_qs = Lesson.objects.all() if delete else Lesson.objects.filter(id__in=[r['id'] for r in records])
+        existing = {lesson.id: lesson for lesson in existing_qs}
+
+        to_create = []
+        to_update = []
+        for record in records:
+            current = existing.get(record['id'])
+            lesson = self._build(record, current)
+            if current is None:
+                to_create.append(lesson)
+            elif any(getattr(lesson, f) != getattr(current, f) for f in SYNC_FIELDS):
+                to_update.append(lesson)
+        seen = {r['id'] for r in records}
+        to_delete = [pk for pk in existing if pk not in seen] if delete else []
+
+        for lesson in to_create:
+            self.stdout.write(self.style.SUCCESS(f'create: {lesson.title} ({lesson.id})'))
+        for lesson in to_update:
+            changed = [f for f in SYNC_FIELDS if getattr(lesson, f) != getattr(existing[lesson.id], f)]
+            self.stdout.write(self.style.WARNING(f'update: {lesson.title} ({lesson.id}) {", ".join(changed)}'))
+        for pk in to_delete:
+            self.stdout.write(self.style.ERROR(f'delete: {existing[pk].title} ({pk})'))
+
+        summary = (
+            f'新規 {len(to_create)} / 更新 {len(to_update)} / 削除 {len(to_delete)} / '
+            f'変更なし {len(records) - len(to_create) - len(to_update)}'
+        )
+        if dry_run:
+            self.stdout.write(f'[dry-run] {summary}')
+            return
+        if not (to_create or to_update or to_delete):
+            self.stdout.write(summary)
+            return
+
+        with transaction.atomic():
+            # 新規・更新をまとめてUPSERT(bulk_create はシグナルを送らないため後でキャッシュを無効化)
+            Lesson.objects.bulk_create(
+                to_create + to_update,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=[*SYNC_FIELDS, 'updated_at'],
             )
-            
-            if created:
-                self.stdout.write(
-                    self.style.SUCCESS(f'Successfully created lesson: {lesson.title} ({lesson.id})')
-                )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(f'Lesson already exists: {lesson.title} ({lesson.id})')
-                )
\ No newline at end of file
+            if to_delete:
+                Lesson.objects.filter(id__in=to_delete).delete()
+            invalidate_lesson_caches(Lesson)
+
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _load(self, path):
+        if not path:
+            rows = LESSONS_DATA
+        else:
+            file_path = Path(path)
+            if not file_path.exists():
+                raise CommandError(f'ファイルが見つかりません: {path}')
+            with file_path.open(encoding='utf-8') as f:
+                if file_path.suffix.lower() == '.csv':
+                    rows = list(csv.DictReader(f))
+                else:
+                    rows = json.load(f)
+
+        records = []
+        seen = set()
+        for row in rows:
+            if not row.get('id') or not row.get('title'):
+                raise CommandError(f'id と title は必須です: {row}')
+            if row['id'] in seen:
+                raise CommandError(f'id が重複しています: {row["id"]}')
+            seen.add(row['id'])
+            # 空文字の項目は未指定として扱う(CSVの空欄対策)
+            records.append({k: v for k, v in row.items() if v not in (None, '')})
+        return records
+
+    def _build(self, record, current):
+        values = {f: getattr(current, f) for f in SYNC_FIELDS} if current else {}
+        values.update({f: record[f] for f in SYNC_FIELDS if f in record})
+        if 'default_url' not in record and 'url' in record:
+            values['default_url'] = record['url']  # default_urlにも同じURLを設定
+        values.setdefault('description', '')
+        values.setdefault('default_url', '')
+        return Lesson(id=record['id'], **values)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import http.client
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = '起動中のサーバーに並行クライアントで負荷をかけ、WSGI/ASGI の req/s と p99 を比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            dest='targets',
+            action='append',
+            required=True,
+            help='名前=ベースURL (例: wsgi=http://127.0.0.1:8000)。複数指定可',
+        )
+        parser.add_argument('--path', dest='path', default='/api/lesson/U01/', help='リクエストするパス')
+        parser.add_argument('--concurrency', dest='concurrency', type=int, default=50, help='並行クライアント数')
+        parser.add_argument('--requests', dest='requests', type=int, default=5000, help='ターゲットごとの総リクエスト数')
+
+    def handle(self, *args, **options):
+        targets = [self._parse_target(raw) for raw in options['targets']]
+        concurrency = max(1, int(options['concurrency']))
+        total = max(1, int(options['requests']))
+        path = options['path']
+
+        self.stdout.write(
+            f'[loadtest_lesson_redirect] path={path} concurrency={concurrency} requests={total}'
+        )
+        for name, base_url in targets:
+            samples, errors, elapsed = self._run(base_url, path, concurrency, total)
+            self._report(name, samples, errors, elapsed)
+
+    def _parse_target(self, raw: str) -> Tuple[str, str]:
+        name, sep, url = raw.partition('=')
+        if not sep or not url.startswith(('http://', 'https://')):
+            raise CommandError(f'--target は 名前=URL の形式で指定してください: {raw}')
+        return name, url
+
+    def _run(self, base_url: str, path: str, concurrency: int, total: int) -> Tuple[List[float], int, float]:
+        parts = urlsplit(base_url)
+        conn_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        request_path = parts.path.rstrip('/') + path
+
+        counter = itertools.count()
+        lock = threading.Lock()
+        samples: List[float] = []
+        errors = [0]
+
+        def client() -> None:
+            # クライアントごとに keep-alive の接続を使い回す
+            conn = conn_class(parts.netloc, timeout=30)
+            local: List[float] = []
+            local_errors = 0
+            try:
+                while next(counter) < total:
+                    started = time.perf_counter()
+                    try:
+                        conn.request('GET', request_path)
+                        resp = conn.getresponse()
+                        resp.read()
+                        if resp.status >= 400:
+                            local_errors += 1
+                    except (OSError, http.client.HTTPException):
+                        local_errors += 1
+                        conn.close()
+                        conn = conn_class(parts.netloc, timeout=30)
+                        continue
+                    local.append(time.perf_counter() - started)
+            finally:
+                conn.close()
+                with lock:
+                    samples.extend(local)
+                    errors[0] += local_errors
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(client)
+        return samples, errors[0], time.perf_counter() - started
+
+    def _report(self, name: str, samples: List[float], errors: int, elapsed: float) -> None:
+        if not samples:
+            self.stderr.write(self.style.ERROR(f'{name}: 成功したリクエストがありません (errors={errors})'))
+            return
+        ordered = sorted(samples)
+        stats: Dict[str, float] = {
+            'p50': ordered[int(len(ordered) * 0.50)],
+            'p99': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        }
+        self.stdout.write(
+            f'{name:>6}: req/s={len(samples) / elapsed:8.0f} '
+            f'p50={stats["p50"] * 1e3:7.2f}ms p99={stats["p99"] * 1e3:7.2f}ms errors={errors}'
+        )
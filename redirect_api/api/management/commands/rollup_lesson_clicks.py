@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Dict, Tuple
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.clicks import click_recorder
+from api.models import LessonClickDaily, LessonClickEvent
+
+
+class Command(BaseCommand):
+    help = 'クリックログ(LessonClickEvent)を日次集計(LessonClickDaily)に反映し、反映済みのログを削除する'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-events',
+            action='store_true',
+            dest='keep_events',
+            help='集計後もクリックログを削除しない(再実行すると二重に加算される点に注意)',
+        )
+
+    def handle(self, *args, **options):
+        # このプロセス内のバッファも先に保存しておく
+        click_recorder.flush()
+
+        with transaction.atomic():
+            last_id = LessonClickEvent.objects.aggregate(last_id=Max('id'))['last_id']
+            if last_id is None:
+                self.stdout.write('集計対象のクリックはありません。')
+                return
+
+            events = LessonClickEvent.objects.filter(id__lte=last_id)
+            rows = (
+                events.annotate(date=TruncDate('clicked_at', tzinfo=timezone.get_current_timezone()))
+                .values('lesson_id', 'date', 'coupon_code')
+                .annotate(clicks=Count('id'))
+                .order_by()
+            )
+            counts: Dict[Tuple[str, object, str], int] = {
+                (row['lesson_id'], row['date'], row['coupon_code']): row['clicks'] for row in rows
+            }
+
+            existing = {
+                (daily.lesson_id, daily.date, daily.coupon_code): daily
+                for daily in LessonClickDaily.objects.filter(
+                    lesson_id__in={key[0] for key in counts},
+                    date__in={key[1] for key in counts},
+                )
+            }
+            to_update = []
+            to_create = []
+            for key, clicks in counts.items():
+                daily = existing.get(key)
+                if daily is not None:
+                    daily.clicks += clicks
+                    to_update.append(daily)
+                else:
+                    lesson_id, date, coupon_code = key
+                    to_create.append(
+                        LessonClickDaily(lesson_id=lesson_id, date=date, coupon_code=coupon_code, clicks=clicks)
+                    )
+
+            LessonClickDaily.objects.bulk_update(to_update, ['clicks'], batch_size=500)
+            LessonClickDaily.objects.bulk_create(to_create, batch_size=500)
+            total = sum(counts.values())
+            if not options.get('keep_events'):
+                events.delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{total} 件のクリックを集計しました (新規 {len(to_create)} 行 / 更新 {len(to_update)} 行)'
+            )
+        )
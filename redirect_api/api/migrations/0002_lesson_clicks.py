@@ -0,0 +1,38 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonClickDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('coupon_code', models.CharField(max_length=8)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('lesson', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.lesson')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LessonClickEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('coupon_code', models.CharField(max_length=8)),
+                ('clicked_at', models.DateTimeField(db_index=True)),
+                ('referrer', models.CharField(blank=True, max_length=500)),
+                ('lesson', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.lesson')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='lessonclickdaily',
+            constraint=models.UniqueConstraint(fields=('lesson', 'date', 'coupon_code'), name='uniq_lesson_click_daily'),
+        ),
+    ]
@@ -12,4 +12,31 @@ class Lesson(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.title}({self.id}): {self.url}"
\ No newline at end of file
+        return f"{self.title}({self.id}): {self.url}"
+
+
+class LessonClickEvent(models.Model):
+    """リダイレクト1回分のクリックログ。api.clicks からまとめて書き込まれる"""
+    lesson = models.ForeignKey(Lesson, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    coupon_code = models.CharField(max_length=8)
+    clicked_at = models.DateTimeField(db_index=True)
+    referrer = models.CharField(max_length=500, blank=True)
+
+    def __str__(self):
+        return f"{self.lesson_id}: {self.clicked_at}"
+
+
+class LessonClickDaily(models.Model):
+    """クリック数の日次集計。rollup_lesson_clicks コマンドで更新する"""
+    lesson = models.ForeignKey(Lesson, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    date = models.DateField()
+    coupon_code = models.CharField(max_length=8)
+    clicks = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.lesson_id} {self.date}: {self.clicks}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lesson', 'date', 'coupon_code'], name='uniq_lesson_click_daily'),
+        ]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from django.db.models import QuerySet
+from django.http import HttpRequest
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LessonCursorPagination(BasePagination):
+    """id 順のキーセット(カーソル)ページネーション。
+
+    カーソルは「前方(a)/後方(b)」と基準の id だけを持つため、
+    OFFSET を使わずにインデックス(主キー)で次のページを取得できる。
+    同期版(DRF)と非同期版(api.async_views)で同じ処理を共有する。
+    """
+
+    page_size = 100
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = 'id'
+    # ページのリンクに引き継ぐ、ページング以外の正規化済みパラメータ(fields など)
+    link_params: Sequence[Tuple[str, str]] = ()
+
+    def canonical_params(self, request: HttpRequest) -> List[Tuple[str, str]]:
+        """応答を変えるページングのパラメータを正規化して返す(未知のパラメータは含めない)。
+
+        不正なカーソルは NotFound。
+        """
+        params: List[Tuple[str, str]] = []
+        direction, position = self._decode(request.GET.get(self.cursor_query_param))
+        if position is not None:
+            params.append((self.cursor_query_param, self._encode(direction, position)))
+        size = self._page_size(request)
+        if size != self.page_size:
+            params.append((self.page_size_query_param, str(size)))
+        return params
+
+    def paginate_queryset(self, queryset: QuerySet, request: HttpRequest, view: Any = None) -> List[Any]:
+        window = self._prepare(queryset, request)
+        return self._finish(list(window))
+
+    async def apaginate_queryset(self, queryset: QuerySet, request: HttpRequest) -> List[Any]:
+        window = self._prepare(queryset, request)
+        return self._finish([row async for row in window])
+
+    def get_paginated_response_data(self, data: Any) -> Dict[str, Any]:
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data: Any) -> Response:
+        return Response(self.get_paginated_response_data(data))
+
+    def get_next_link(self) -> Optional[str]:
+        if not self._has_next or not self._page:
+            return None
+        return self._link('a', self._page[-1].pk)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self._has_previous:
+            return None
+        if not self._page:
+            # 範囲外のカーソルでは先頭に戻るリンクを返す
+            return remove_query_param(self._base_url, self.cursor_query_param)
+        return self._link('b', self._page[0].pk)
+
+    def _prepare(self, queryset: QuerySet, request: HttpRequest) -> QuerySet:
+        # リンクは受け付けるパラメータだけで作る(追跡用などのパラメータで応答が変わらないように)
+        query = [param for param in self.canonical_params(request) if param[0] != self.cursor_query_param]
+        query += list(self.link_params)
+        self._base_url = request.build_absolute_uri(request.path) + (f'?{urlencode(query)}' if query else '')
+        self._size = self._page_size(request)
+        self._direction, self._position = self._decode(request.GET.get(self.cursor_query_param))
+
+        if self._direction == 'b':
+            window = queryset.filter(**{f'{self.ordering}__lt': self._position}).order_by(f'-{self.ordering}')
+        elif self._position is not None:
+            window = queryset.filter(**{f'{self.ordering}__gt': self._position}).order_by(self.ordering)
+        else:
+            window = queryset.order_by(self.ordering)
+        # 1件多く取得して次ページの有無を判定する
+        return window[: self._size + 1]
+
+    def _finish(self, rows: List[Any]) -> List[Any]:
+        has_more = len(rows) > self._size
+        rows = rows[: self._size]
+        if self._direction == 'b':
+            rows.reverse()
+            self._has_previous, self._has_next = has_more, True
+        else:
+            self._has_previous, self._has_next = self._position is not None, has_more
+        self._page = rows
+        return rows
+
+    def _page_size(self, request: HttpRequest) -> int:
+        raw = request.GET.get(self.page_size_query_param)
+        if raw:
+            try:
+                size = int(raw)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    def _link(self, direction: str, position: Any) -> str:
+        return replace_query_param(self._base_url, self.cursor_query_param, self._encode(direction, position))
+
+    def _encode(self, direction: str, position: Any) -> str:
+        return base64.urlsafe_b64encode(f'{direction}:{position}'.encode('utf-8')).decode('ascii')
+
+    def _decode(self, token: Optional[str]) -> Tuple[str, Optional[str]]:
+        if not token:
+            return 'a', None
+        try:
+            direction, _, position = base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8').partition(':')
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if direction not in ('a', 'b') or not position:
+            raise NotFound('Invalid cursor')
+        return direction, position
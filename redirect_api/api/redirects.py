@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .coupons import CouponPeriod, coupon_period
+from .models import Lesson
+
+
+# クーポンコード中の日付プレースホルダ
+COUPON_PLACEHOLDER = 'yyyymmdd'
+# 全ワーカーが参照するリダイレクト表のバージョンスタンプ
+VERSION_CACHE_KEY = 'api:lesson_redirect_table:version'
+
+# プレースホルダで分割済みのURLテンプレート
+UrlTemplate = Tuple[str, ...]
+
+
+class RedirectEntry(NamedTuple):
+    parts: UrlTemplate
+    updated_at: datetime
+
+
+class ResolvedRedirect(NamedTuple):
+    """クーポン期間内で不変のリダイレクト情報(HTTPキャッシュ用ヘッダ値を含む)"""
+
+    url: str
+    etag: str
+    last_modified: str
+    period: CouponPeriod
+    expires: str
+
+
+def split_url_template(url: str) -> UrlTemplate:
+    """URLをプレースホルダで分割する。置換は `url_date.join(parts)` で行う。"""
+    return tuple(url.split(COUPON_PLACEHOLDER))
+
+
+class LessonRedirectTable:
+    """Lesson id -> 分割済みURLテンプレート のプロセス内リダイレクト表。
+
+    Lesson の保存/削除シグナルでキャッシュ上のバージョンスタンプを更新し、
+    各ワーカーは check_interval 秒ごとにスタンプを確認して差分があれば再構築する。
+    ルックアップ自体はORMにアクセスしない。
+    """
+
+    def __init__(self, check_interval: Optional[float] = None) -> None:
+        self._check_interval = check_interval
+        self._entries: Dict[str, RedirectEntry] = {}
+        self._version: Optional[str] = None
+        self._generation = 0
+        self._loaded = False
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def check_interval(self) -> float:
+        if self._check_interval is not None:
+            return self._check_interval
+        return float(getattr(settings, 'LESSON_REDIRECT_CHECK_INTERVAL', 1.0))
+
+    @property
+    def version(self) -> Optional[str]:
+        """Lesson の版。Lesson が変わるたびに変わる(ensure_fresh 後に参照する)"""
+        return self._version
+
+    @property
+    def generation(self) -> int:
+        """再構築のたびに増える世代番号。派生キャッシュの無効化判定に使う"""
+        return self._generation
+
+    def get(self, pk: str) -> Optional[RedirectEntry]:
+        """鮮度確認を行わずに参照する(呼び出し側で ensure_fresh を済ませておく)"""
+        return self._entries.get(pk)
+
+    def ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            # スタンプが無ければ発行する(一覧のスナップショット等のキーにも使うため常に値を持たせる)
+            cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_CACHE_KEY)
+        if not self._loaded or version != self._version:
+            self.rebuild(version)
+        self._next_check = now + self.check_interval
+
+    async def aensure_fresh(self) -> None:
+        """ensure_fresh の非同期版(ASGI のビューから使用)"""
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+        version = await cache.aget(VERSION_CACHE_KEY)
+        if version is None:
+            await cache.aadd(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = await cache.aget(VERSION_CACHE_KEY)
+        if not self._loaded or version != self._version:
+            await self.arebuild(version)
+        self._next_check = now + self.check_interval
+
+    def rebuild(self, version: Optional[str] = None) -> None:
+        """DBから表全体を組み立て直し、参照を一括で差し替える"""
+        self._install(list(self._rows()), version)
+
+    async def arebuild(self, version: Optional[str] = None) -> None:
+        rows = [row async for row in self._rows()]
+        self._install(rows, version)
+
+    def _rows(self):
+        return Lesson.objects.values_list('id', 'url', 'default_url', 'updated_at')
+
+    def _install(self, rows, version: Optional[str]) -> None:
+        with self._lock:
+            entries: Dict[str, RedirectEntry] = {}
+            for pk, url, default_url, updated_at in rows:
+                # urlがNoneの場合は、default_urlを使用。どちらも無ければ登録しない(404)
+                redirect_url = url or default_url
+                if redirect_url:
+                    entries[pk] = RedirectEntry(split_url_template(redirect_url), updated_at)
+            self._entries = entries
+            self._version = version
+            self._generation += 1
+            self._loaded = True
+
+    def invalidate(self) -> None:
+        """新しいバージョンスタンプを発行し、全ワーカーに再構築させる"""
+        cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        self._loaded = False
+
+
+class LessonUrlResolver:
+    """クーポン期間ごとに置換済みURLを保持するリゾルバ。
+
+    置換結果は期間の境界(CouponPeriod.end)を越えるか、
+    リダイレクト表が再構築されるまで再利用する。
+    ETag は Lesson.updated_at とクーポンコードから作るため、期間が変われば変わる。
+    """
+
+    def __init__(self, table: LessonRedirectTable) -> None:
+        self._table = table
+        # (期間, 表の世代番号, pk -> 解決結果) をまとめて差し替える
+        self._state: Optional[Tuple[CouponPeriod, int, Dict[str, ResolvedRedirect]]] = None
+
+    def period(self, moment: Optional[datetime] = None) -> CouponPeriod:
+        """moment(未指定時は現在)を含むクーポン期間を返す"""
+        moment = moment or timezone.now()
+        state = self._state
+        if state is not None and state[0].contains(moment):
+            return state[0]
+        return coupon_period(moment)
+
+    def resolve(self, pk: str, moment: Optional[datetime] = None) -> Optional[ResolvedRedirect]:
+        """置換済みのリダイレクト情報を返す。対象が無ければ None"""
+        self._table.ensure_fresh()
+        return self._resolve_loaded(pk, moment or timezone.now())
+
+    async def aresolve(self, pk: str, moment: Optional[datetime] = None) -> Optional[ResolvedRedirect]:
+        """resolve の非同期版。表の再構築が必要な場合のみ非同期ORMでDBを読む"""
+        await self._table.aensure_fresh()
+        return self._resolve_loaded(pk, moment or timezone.now())
+
+    def _resolve_loaded(self, pk: str, moment: datetime) -> Optional[ResolvedRedirect]:
+        state = self._state
+        period = self.period(moment)
+        if state is None or state[0] is not period or state[1] != self._table.generation:
+            # 参照を一括で差し替えるだけなので並行リクエストでも安全
+            state = (period, self._table.generation, {})
+            self._state = state
+
+        _, _, resolved = state
+        redirect = resolved.get(pk)
+        if redirect is None:
+            entry = self._table.get(pk)
+            if entry is None:
+                return None
+            redirect = ResolvedRedirect(
+                url=period.code.join(entry.parts),
+                etag=f'"{pk}-{entry.updated_at.timestamp():.6f}-{period.code}"',
+                last_modified=http_date(entry.updated_at.timestamp()),
+                period=period,
+                expires=http_date(period.end.timestamp()),
+            )
+            resolved[pk] = redirect
+        return redirect
+
+redirect_table = LessonRedirectTable()
+url_resolver = LessonUrlResolver(redirect_table)
@@ -0,0 +1,24 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson  # type: ignore
+except Exception:  # orjson 未インストール時は標準の JSONRenderer と同じ出力
+    orjson = None  # type: ignore
+
+
+class ORJSONRenderer(JSONRenderer):
+    """orjson でシリアライズする JSONRenderer。
+
+    インデント指定(ブラウザ表示など)がある場合や orjson が無い場合は標準の実装を使用する。
+    非ASCII文字をエスケープしない点は DRF の既定(UNICODE_JSON)と同じ。
+    """
+
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self._encoder.default)
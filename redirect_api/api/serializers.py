@@ -3,8 +3,26 @@ from rest_framework import serializers
 from django.shortcuts import get_object_or_404
 
 
+def parse_fields(raw):
+    """?fields=id,title を LessonSerializer の項目名のタプルに変換する。未指定なら None"""
+    if not raw:
+        return None
+    requested = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in requested if f not in LessonSerializer.Meta.fields]
+    if unknown or not requested:
+        raise serializers.ValidationError({'fields': [f"指定できる項目は {', '.join(LessonSerializer.Meta.fields)} です。"]})
+    return requested
+
+
 class LessonSerializer(serializers.ModelSerializer):
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # fields が指定された場合は、その項目だけを出力する
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
     
     class Meta:
         model = Lesson
-        fields = ('title', 'description', 'url', 'default_url',)
+        fields = ('id', 'title', 'description', 'url', 'default_url',)
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Lesson
+from .redirects import redirect_table
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_caches(sender, **kwargs):
+    # Lessonが変更されたらリダイレクト表・一覧のスナップショットを全ワーカーで作り直させる
+    # (コミット前に無効化すると、他のワーカーが古い行でキャッシュを作り直してしまう)
+    transaction.on_commit(redirect_table.invalidate)
@@ -1,10 +1,23 @@
 from rest_framework.routers import DefaultRouter
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
+from .fastpath import LESSON_PK_PATTERN, lesson_redirect
 from .views import LessonViewSet
 
 router = DefaultRouter()
 router.register('lesson', LessonViewSet, basename='lesson')
 
 urlpatterns = [
+    # リダイレクトはDRFを経由せずに処理する(ルーターより先に評価)
+    re_path(r'^lesson/' + LESSON_PK_PATTERN + r'/$', lesson_redirect, name='lesson-redirect'),
     path('', include(router.urls))
-]
\ No newline at end of file
+]
+
+if getattr(settings, 'LESSON_ASYNC_VIEWS', False):
+    # ASGIプロファイルでは一覧・リダイレクトを非同期ビューで処理する
+    from .async_views import lesson_list_async, lesson_redirect_async
+
+    urlpatterns = [
+        path('lesson/', lesson_list_async, name='lesson-list-async'),
+        re_path(r'^lesson/' + LESSON_PK_PATTERN + r'/$', lesson_redirect_async, name='lesson-redirect'),
+    ] + urlpatterns[1:]
@@ -2,15 +2,18 @@ from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
 
+# 404エラー時のレスポンス本文(DRF・高速パスで共通)
+NOT_FOUND_DATA = {
+    'error': 'Not found',
+    'message': 'このリソースは見つかりませんでした。'
+}
+
 def custom_exception_handler(exc, context):
     # デフォルトの例外ハンドラを呼び出します。
     response = exception_handler(exc, context)
 
     # 例外が404エラーの場合、カスタムレスポンスを生成します。
     if response is not None and response.status_code == status.HTTP_404_NOT_FOUND:
-        response.data = {
-            'error': 'Not found',
-            'message': 'このリソースは見つかりませんでした。'
-        }
+        response.data = dict(NOT_FOUND_DATA)
 
     return response
@@ -1,40 +1,68 @@
 from rest_framework.response import Response
-from rest_framework import viewsets
-from django.http import HttpResponseRedirect, Http404
+from rest_framework import renderers, viewsets
+from django.http import Http404
+from .catalog import build_snapshot, catalog_variant, get_snapshot, snapshot_key, snapshot_response, store_snapshot
+from .caching import catalog_not_modified, catalog_validators, redirect_response
+from .clicks import click_recorder
 from .models import Lesson
-from .serializers import LessonSerializer
-from datetime import datetime
+from .pagination import LessonCursorPagination
+from .redirects import url_resolver
+from .renderers import ORJSONRenderer
+from .serializers import LessonSerializer, parse_fields
 
-lessons = {}
 
 class LessonViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    pagination_class = LessonCursorPagination
+    renderer_classes = [ORJSONRenderer, renderers.BrowsableAPIRenderer]
+
+    def get_requested_fields(self):
+        # ?fields=id,title で出力項目を絞り込む
+        if not hasattr(self, '_fields'):
+            self._fields = parse_fields(self.request.query_params.get('fields'))
+        return self._fields
+
+    def get_queryset(self):
+        # 出力する項目だけをDBから取得する
+        fields = self.get_requested_fields() or LessonSerializer.Meta.fields
+        return super().get_queryset().only(*fields)
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    # 一覧画面(描画済みのスナップショットを返す。更新がなければ304)
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        # キャッシュのキー・ETag は受け付けるパラメータだけから作る
+        variant = catalog_variant(request, self.paginator, self.get_requested_fields())
+        key = snapshot_key(request, variant)
+        snapshot = get_snapshot(key)
+        if snapshot is not None:
+            return snapshot_response(request, snapshot)
+
+        etag, last_modified = catalog_validators(variant)
+        not_modified = catalog_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        snapshot = build_snapshot(response.data, etag, last_modified)
+        store_snapshot(key, snapshot)
+        return snapshot_response(request, snapshot)
     
     # 詳細画面
     def retrieve(self, request, *args, **kwargs):
-        # 現在の日付を取得
-        now = datetime.now()
-        # 日付に基づいてリダイレクトURLに使用する日付の部分を決定
-        day = '01'
-        if 6 <= now.day:
-            day = '11'
-        url_date = now.strftime('%Y%m') + day
-        # requestからpkを取得し、整数型として扱う
+        # 現在のクーポン期間で置換済みのURLを取得(ORMにはアクセスしない)
         pk = kwargs.get('pk')
-        # pkをキーにしてlessonsに格納
-        if pk not in lessons:
-            instance = self.get_object()
-            lessons[pk] = instance
-        else:
-            instance = lessons[pk]
-        
-        # リダイレクトURLを決定。instance.urlがNoneの場合は、instance.default_urlを使用
-        redirect_url = instance.url or instance.default_url
-        # redirect_urlがNoneの場合は404エラーを発生
-        if redirect_url is None:
+        redirect = url_resolver.resolve(pk)
+        # 未登録、またはURLが未設定の場合は404エラーを発生
+        if redirect is None:
             raise Http404("ページが見つかりませんでした。")
         
-        # yyyymmddを適切な値に置換してリダイレクト
-        redirect_url = redirect_url.replace('yyyymmdd', url_date)
-        return HttpResponseRedirect(redirect_url)
+        # クリックを記録(保存はバックグラウンドでまとめて行う)
+        click_recorder.record(pk, redirect.period.code, request.headers.get('Referer'))
+        # 次のクーポン期間の境界までキャッシュ可能なリダイレクト
+        return redirect_response(request, redirect)
@@ -5,12 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+The ASGI profile (async lesson views) lives in redirect_api/settings_asgi.py.
 """
 
 import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redirect_api.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redirect_api.settings_asgi')
 
 application = get_asgi_application()
@@ -136,6 +136,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 ALLOWED_HOSTS = ["127.0.0.1", "localhost", "naokimatsu.pythonanywhere.com"]
 
+# Cache
+# 全ワーカーで共有できるようファイルベースのキャッシュを使用する
+# (api.redirects のバージョンスタンプ等)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.django_cache'),
+    },
+    # Lesson 一覧のスナップショット専用(default のバージョンスタンプを押し出さないように分ける)
+    'lesson_catalog': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.django_cache_lesson_catalog'),
+    },
+}
+
+# リダイレクト表のバージョンスタンプを確認する間隔(秒)
+LESSON_REDIRECT_CHECK_INTERVAL = 1.0
+# /api/lesson/<pk>/ をWSGIレベルで処理する(ミドルウェア・DRFを経由しない)
+LESSON_REDIRECT_FAST_PATH = True
+
+# クリックログ(api.clicks): バッファ上限・一括保存の件数/間隔(秒)
+LESSON_CLICK_TRACKING = True
+LESSON_CLICK_BUFFER_SIZE = 10000
+LESSON_CLICK_FLUSH_SIZE = 500
+LESSON_CLICK_FLUSH_INTERVAL = 5.0
+
+# レッスン一覧の描画済みJSON(api.catalog)の保持期間(秒)。Lesson 更新時は版の変更で無効になる
+LESSON_CATALOG_CACHE_TIMEOUT = 86400
+
 REST_FRAMEWORK = {
-    'EXCEPTION_HANDLER': 'redirect_api.api.utils.custom_exception_handler'
+    'EXCEPTION_HANDLER': 'api.utils.custom_exception_handler'
 }
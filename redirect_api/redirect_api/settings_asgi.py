@@ -0,0 +1,23 @@
+"""
+ASGI deployment profile for redirect_api project.
+
+settings.py を継承し、ASGIサーバー(uvicorn / daphne 等)で動かす場合の差分のみを定義する。
+asgi.py はこのモジュールを既定の設定として読み込む。
+
+起動例::
+
+    uvicorn redirect_api.asgi:application --workers 1 --port 8001
+
+- /api/lesson/ と /api/lesson/<pk>/ は非同期ビュー(api.async_views)で処理し、
+  リクエストごとにワーカースレッドを占有しない。
+- 標準のミドルウェアはすべて非同期対応のため、スレッドの切り替えは発生しない。
+- WSGIとの比較は ``python manage.py loadtest_lesson_redirect`` で行う。
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# 一覧・リダイレクトを非同期ビューに切り替える
+LESSON_ASYNC_VIEWS = True
+
+# WSGI用の高速パスは ASGI では使用しない
+LESSON_REDIRECT_FAST_PATH = False
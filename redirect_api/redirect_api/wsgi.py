@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'redirect_api.settings')
 
 application = get_wsgi_application()
+
+# レッスンのリダイレクトはミドルウェアを通さずに処理する
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'LESSON_REDIRECT_FAST_PATH', True):
+    from api.fastpath import LessonRedirectWSGIApp  # noqa: E402
+
+    application = LessonRedirectWSGIApp(application)
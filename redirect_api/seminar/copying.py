@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from django.db import transaction
+
+from .models import (
+    Participant,
+    PersonalSeminar,
+    PersonalSeminarDate,
+    PreparationTask,
+    PreparationTaskTemplate,
+    PreparationTemplate,
+)
+from .scheduling import TaskKey, anchor_dates, plan_tasks, used_task_templates
+
+
+# 複製時にコピーするタスクの項目(values() で取得)
+TASK_COPY_FIELDS: tuple[str, ...] = (
+    "name",
+    "deadline",
+    "assignee",
+    "notes",
+    "is_done",
+    "template_task_id",
+    "session_date",
+)
+PARTICIPANT_COPY_FIELDS: tuple[str, ...] = ("name", "email", "notes")
+
+
+def clone_seminar(
+    source: PersonalSeminar,
+    offset_days: int = 0,
+    *,
+    reset_done: bool = True,
+    target: Optional[PersonalSeminar] = None,
+    session_dates: Optional[Iterable[date]] = None,
+) -> PersonalSeminar:
+    """セミナーを開催日・準備タスク・参加者ごと複製する。
+
+    開催日とタスクの締切日は offset_days 日ずらす。reset_done なら完了状態を戻す。
+    target(未保存可)を渡すとその内容で保存し、省略時は source の項目をコピーする。
+    session_dates を渡すと開催日はその日付で作り、元の開催日を日付順に対応付けて
+    タスクを開催日ごとにずらす(対応先の無い開催日のタスクは複製せず、新しい開催日には
+    元のセミナーで使用中のテンプレートから生成する。reschedule_tasks と同じ扱い)。
+    関連テーブルごとに bulk_create 1回で、全体を1トランザクションで保存する。
+    """
+    offset = timedelta(days=offset_days)
+    if target is None:
+        target = PersonalSeminar(
+            title=f"{source.title}（複製）",
+            description=source.description,
+            location=source.location,
+            capacity=source.capacity,
+            price=source.price,
+            format=source.format,
+            task_anchor=source.task_anchor,
+        )
+
+    source_dates = sorted(source.dates.values_list("date", flat=True))  # type: ignore[attr-defined]
+    if session_dates is None:
+        new_dates = [d + offset for d in source_dates]
+        moves: Dict[date, date] = {d: d + offset for d in source_dates}
+    else:
+        new_dates = sorted(set(session_dates))
+        moves = dict(zip(source_dates, new_dates))
+
+    with transaction.atomic():
+        target.save()
+
+        PersonalSeminarDate.objects.bulk_create(
+            [PersonalSeminarDate(seminar=target, date=d) for d in new_dates]
+        )
+
+        tasks = []
+        seen: Set[TaskKey] = set()
+        for row in source.tasks.order_by("deadline", "id").values(*TASK_COPY_FIELDS):  # type: ignore[attr-defined]
+            session_date = row["session_date"]
+            if session_date is None or session_dates is None:
+                # 手動で追加したタスク・開催日の指定が無い場合は全体のずらし幅で移動する
+                row["deadline"] += offset
+                if session_date is not None:
+                    row["session_date"] = session_date + offset
+            elif session_date in moves:
+                row["deadline"] += moves[session_date] - session_date
+                row["session_date"] = moves[session_date]
+                # 開催日ごとにずらし幅が違うため、同じ名前・締切日のタスクができたら1件にまとめる
+                if (row["name"], row["deadline"]) in seen:
+                    continue
+            else:
+                # 複製先に対応する開催日が無い
+                continue
+            seen.add((row["name"], row["deadline"]))
+            if reset_done:
+                row["is_done"] = False
+            tasks.append(PreparationTask(seminar=target, **row))
+
+        # 元に対応する開催日の無い基準日にはテンプレートからタスクを作る
+        mapped = set(moves[d] for d in anchor_dates(source_dates, source.task_anchor) if d in moves)
+        fresh = [d for d in anchor_dates(new_dates, target.task_anchor) if d not in mapped]
+        if fresh:
+            tasks.extend(plan_tasks(target, used_task_templates(source), fresh, seen))
+        PreparationTask.objects.bulk_create(tasks, batch_size=500)
+
+        participants = [
+            Participant(seminar=target, **row)
+            for row in source.participants.order_by("id").values(*PARTICIPANT_COPY_FIELDS)  # type: ignore[attr-defined]
+        ]
+        Participant.objects.bulk_create(participants, batch_size=500)
+    return target
+
+
+# 複製・統合時にコピーするテンプレートタスクの項目(values() で取得)
+TASK_TEMPLATE_COPY_FIELDS: tuple[str, ...] = ("name", "relative_days_before", "default_assignee", "default_notes")
+
+
+def _copy_task_templates(
+    template_ids: Sequence[int], target: PreparationTemplate, *, dedupe: bool = False
+) -> List[PreparationTaskTemplate]:
+    # テンプレートの指定順・id 順に1クエリで取得し、bulk_create 1回で保存する
+    order = {template_id: index for index, template_id in enumerate(template_ids)}
+    rows = sorted(
+        PreparationTaskTemplate.objects.filter(template_id__in=template_ids)
+        .order_by("id")
+        .values("template_id", *TASK_TEMPLATE_COPY_FIELDS),
+        key=lambda row: order[row["template_id"]],
+    )
+    seen: Set[Tuple[str, Optional[int]]] = set()
+    copies: List[PreparationTaskTemplate] = []
+    for row in rows:
+        del row["template_id"]
+        key = (row["name"], row["relative_days_before"])
+        if dedupe:
+            if key in seen:
+                continue
+            seen.add(key)
+        copies.append(PreparationTaskTemplate(template=target, **row))
+    return PreparationTaskTemplate.objects.bulk_create(copies, batch_size=500)
+
+
+def copy_template(source: PreparationTemplate, name: Optional[str] = None) -> PreparationTemplate:
+    """テンプレートをタスクごと複製する(タスク数によらず一定のクエリ数)"""
+    with transaction.atomic():
+        new = PreparationTemplate.objects.create(
+            name=name or f"{source.name}（複製）",
+            description=source.description,
+        )
+        _copy_task_templates([source.pk], new)
+    return new
+
+
+def merge_templates(sources: Sequence[PreparationTemplate], name: str, description: str = "") -> PreparationTemplate:
+    """複数のテンプレートを1つに統合した新しいテンプレートを作る。
+
+    (タスク名, 相対日) が同じタスクは先に指定したテンプレートのものだけを残す。
+    """
+    with transaction.atomic():
+        new = PreparationTemplate.objects.create(name=name, description=description)
+        _copy_task_templates([source.pk for source in sources], new, dedupe=True)
+    return new
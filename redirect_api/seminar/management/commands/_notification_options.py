@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from ...outbox import MODE_DIGEST, MODE_SEMINAR, DrainReport
+from ...slack import SlackDelivery
+
+
+class NotificationDeliveryMixin:
+    """通知を送信するコマンド共通の引数と結果表示"""
+
+    def add_delivery_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--mode",
+            choices=[MODE_DIGEST, MODE_SEMINAR],
+            default=MODE_DIGEST,
+            help="digest: Webhookごとに全セミナー・全日数を1つのダイジェストにまとめる / seminar: セミナー・日数ごとに送信",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="並行して送信する最大数",
+        )
+        parser.add_argument(
+            "--per-host",
+            dest="per_host",
+            type=int,
+            default=4,
+            help="Webhook のホストごとの同時送信数",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=10.0,
+            help="1件あたりのタイムアウト(秒)",
+        )
+        parser.add_argument(
+            "--deadline",
+            type=float,
+            default=120.0,
+            help="送信全体の締切(秒)。過ぎた分は再送待ちにする",
+        )
+
+    def build_delivery(self, options) -> SlackDelivery:
+        return SlackDelivery(
+            max_workers=max(1, int(options.get("concurrency") or 8)),
+            max_per_host=max(1, int(options.get("per_host") or 4)),
+            timeout=float(options.get("timeout") or 10.0),
+            deadline=float(options.get("deadline") or 120.0),
+        )
+
+    def write_drain_report(self, report: DrainReport) -> None:
+        for message, result, rows in report.deliveries:
+            seminars = ",".join(str(row.seminar_id) for row in rows)
+            if result.ok:
+                self.stdout.write(  # type: ignore[attr-defined]
+                    self.style.SUCCESS(f"通知済: seminar_id={seminars} 件数={len(rows)}")  # type: ignore[attr-defined]
+                )
+            else:
+                self.stderr.write(  # type: ignore[attr-defined]
+                    self.style.ERROR(f"Slack送信失敗: seminar_id={seminars} ({result.error})")  # type: ignore[attr-defined]
+                )
+        self.stdout.write(  # type: ignore[attr-defined]
+            f"[outbox] 送信済 {report.sent} 件 / 再送予定 {report.retried} 件 / 失敗 {report.failed} 件 / 送信不要 {report.skipped} 件"
+        )
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from ...outbox import drain
+from ._notification_options import NotificationDeliveryMixin
+
+
+class Command(NotificationDeliveryMixin, BaseCommand):
+    help = "通知の outbox から送信期限の来たものを送信する(失敗分はバックオフして再送)"
+
+    def add_arguments(self, parser):
+        self.add_delivery_arguments(parser)
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1000,
+            help="1回に送信する最大件数",
+        )
+
+    def handle(self, *args, **options):
+        report = drain(self.build_delivery(options), mode=options["mode"], limit=max(1, int(options["limit"])))
+        self.write_drain_report(report)
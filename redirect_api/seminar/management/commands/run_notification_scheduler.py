@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import os
+import signal
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from ...notification_scheduler import (
+    SchedulerState,
+    default_state_file,
+    due_dates,
+    latest_due_date,
+    max_catchup_days,
+    parse_time,
+    schedule_time,
+    schedule_timezone,
+)
+from ...outbox import drain
+from ...slack import SlackDelivery
+from ._notification_options import NotificationDeliveryMixin
+
+
+class Command(NotificationDeliveryMixin, BaseCommand):
+    help = (
+        "常駐してタスク通知を毎日決まった時刻に実行する(cron での send_task_notifications の代わり)。"
+        "最後に実行した基準日を状態ファイルに保存し、停止中に実行できなかった日は再起動後に取り戻す"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--at",
+            default=None,
+            help="毎日の実行時刻(HH:MM)。未指定時は settings.NOTIFICATION_SCHEDULE_TIME (既定 09:00)",
+        )
+        parser.add_argument(
+            "--timezone",
+            default=None,
+            help="実行時刻のタイムゾーン。未指定時は settings.NOTIFICATION_SCHEDULE_TIMEZONE (既定 Asia/Tokyo)",
+        )
+        parser.add_argument(
+            "--state-file",
+            dest="state_file",
+            default=None,
+            help="最終実行日と稼働状況(ヘルスチェック用)を書き出す JSON ファイル",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="実行時刻を確認する間隔(秒)",
+        )
+        parser.add_argument(
+            "--drain-interval",
+            dest="drain_interval",
+            type=float,
+            default=300.0,
+            help="outbox の再送待ちを送信する間隔(秒)",
+        )
+        parser.add_argument(
+            "--heartbeat",
+            type=float,
+            default=60.0,
+            help="状態ファイルの heartbeat を更新する間隔(秒)。実行・状態の変化時はすぐに書き込む",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="実行時刻を過ぎている分だけ実行して終了する",
+        )
+        self.add_delivery_arguments(parser)
+
+    def handle(self, *args, **options):
+        try:
+            self._tz = ZoneInfo(options.get("timezone") or schedule_timezone())
+        except (ZoneInfoNotFoundError, ValueError) as e:
+            raise CommandError(f"タイムゾーンが不正です: {e}")
+        try:
+            self._at = parse_time(options.get("at") or schedule_time())
+        except ValueError:
+            raise CommandError("--at は HH:MM 形式で指定してください")
+
+        self._options = options
+        self._mode = options["mode"]
+        self._delivery: SlackDelivery = self.build_delivery(options)
+        self._path = Path(options.get("state_file") or default_state_file())
+        interval = max(0.1, float(options["interval"]))
+        drain_interval = timedelta(seconds=max(1.0, float(options["drain_interval"])))
+        heartbeat = timedelta(seconds=max(1.0, float(options["heartbeat"])))
+
+        self._stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self._stop.set())
+
+        self._state = SchedulerState.load(self._path)
+        self._state.pid = os.getpid()
+        self._state.started_at = self._now().isoformat()
+        self._state.status = "running"
+        self._state.last_error = ""
+
+        now = self._now()
+        # 未実行の日があれば起動直後に実行し、無ければ次の実行時刻まで待つ
+        pending = due_dates(now, self._at, self._state.last_run_date, max_catchup_days())
+        next_run = now if pending else self._next_run_after(now)
+        next_drain = now + drain_interval
+        next_heartbeat = now
+        self.stdout.write(
+            f"[run_notification_scheduler] at={self._at:%H:%M} tz={self._tz.key} "
+            f"last_run_date={self._state.last_run_date} state_file={self._path}"
+        )
+
+        try:
+            while not self._stop.is_set():
+                now = self._now()
+                # 実行時刻前は時刻の比較だけで終わる(DB にもファイルにも触れない)
+                worked = False
+                if now >= next_run:
+                    next_run = self._run_due(now, retry_at=now + timedelta(seconds=max(interval, 60.0)))
+                    next_drain = now + drain_interval
+                    worked = True
+                elif now >= next_drain:
+                    self._drain(now)
+                    next_drain = now + drain_interval
+                    worked = True
+
+                if worked or now >= next_heartbeat:
+                    self._state.next_run_at = next_run.isoformat()
+                    self._state.heartbeat_at = now.isoformat()
+                    self._save()
+                    next_heartbeat = now + heartbeat
+                if options.get("once"):
+                    break
+                self._stop.wait(interval)
+        finally:
+            self._state.status = "stopped"
+            self._state.heartbeat_at = self._now().isoformat()
+            self._save()
+            self.stdout.write("[run_notification_scheduler] 停止しました。")
+
+    def _now(self) -> datetime:
+        return datetime.now(self._tz)
+
+    def _next_run_after(self, now: datetime) -> datetime:
+        next_date = latest_due_date(now, self._at) + timedelta(days=1)
+        return datetime.combine(next_date, self._at, tzinfo=self._tz)
+
+    def _run_due(self, now: datetime, retry_at: datetime) -> datetime:
+        """未実行の基準日を古い順に実行し、次に実行する時刻を返す"""
+        for base_date in due_dates(now, self._at, self._state.last_run_date, max_catchup_days()):
+            if self._stop.is_set():
+                return retry_at
+            if not self._enqueue(base_date):
+                # 失敗した日は watermark を進めずに少し待って再実行する
+                return retry_at
+            self._state.last_run_date = base_date
+            self._save()
+        self._drain(now)
+        return self._next_run_after(now)
+
+    def _enqueue(self, base_date: date) -> bool:
+        """基準日の通知を outbox に登録する(送信はまとめて _drain で行う)"""
+        # 常駐プロセスでは切断・期限切れの DB 接続を実行ごとに捨てる
+        close_old_connections()
+        self._state.runs += 1
+        try:
+            call_command(
+                "send_task_notifications",
+                base_date=base_date.isoformat(),
+                mode=self._mode,
+                no_drain=True,
+                stdout=self.stdout,
+                stderr=self.stderr,
+            )
+        except Exception as e:
+            self._fail(f"{base_date}: {e}")
+            return False
+        finally:
+            close_old_connections()
+        self._state.last_success_at = self._now().isoformat()
+        self._state.last_error = ""
+        self._state.status = "running"
+        return True
+
+    def _drain(self, now: datetime) -> None:
+        close_old_connections()
+        try:
+            # 締切切れの判定はスケジュールのタイムゾーンでの日付で行う
+            report = drain(self._delivery, mode=self._mode, now=now, today=now.date())
+        except Exception as e:
+            self._fail(f"drain: {e}")
+            return
+        finally:
+            close_old_connections()
+        if report.deliveries or report.failed or report.skipped:
+            self.write_drain_report(report)
+
+    def _fail(self, message: str) -> None:
+        self._state.failures += 1
+        self._state.last_error = message[:1000]
+        self._state.status = "error"
+        self.stderr.write(self.style.ERROR(f"[run_notification_scheduler] 失敗: {message}"))
+
+    def _save(self) -> None:
+        try:
+            self._state.save(self._path)
+        except OSError as e:
+            self.stderr.write(self.style.WARNING(f"状態ファイルを書き込めません: {self._path} ({e})"))
@@ -1,19 +1,22 @@
 from __future__ import annotations
 
+import json
 from collections import defaultdict
 from datetime import date as _date, timedelta
-from typing import Dict, List, Optional, Sequence, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 
 from ...models import NotificationSetting, PreparationTask
-from ...utils import post_to_slack
+from ...outbox import MODE_DIGEST, MODE_SEMINAR, OutboxEntry, drain, enqueue, render_section, render_text
+from ...slack import build_digest
+from ._notification_options import NotificationDeliveryMixin
 from django.conf import settings
 from account.models import ExternalIntegration
 
 
-class Command(BaseCommand):
+class Command(NotificationDeliveryMixin, BaseCommand):
     help = "未完了タスクの締切が N 日後のものを Slack に通知する (N は NotificationSetting で定義)"
 
     def add_arguments(self, parser):
@@ -33,11 +36,26 @@ class Command(BaseCommand):
             dest="webhook_url",
             help="Slack Webhook URL (settings を上書き)",
         )
+        parser.add_argument(
+            "--no-drain",
+            action="store_true",
+            dest="no_drain",
+            help="outbox に登録するだけで送信しない(drain_notification_outbox で送信)",
+        )
+        self.add_delivery_arguments(parser)
 
     def handle(self, *args, **options):
-        """メイン処理。引数解釈→対象日抽出→日毎にタスク抽出→通知送信。
-
-        挙動は従来と同一。可読性のためにヘルパー関数へ分割。
+        """メイン処理。引数解釈→対象日抽出→締切タスクの一括取得→outbox への登録→送信。
+
+        通知は (Webhook, セミナー, 締切日, 日数) ごとに outbox へ登録するため、再実行しても
+        送信済みの通知は送り直さず、送信失敗で終わった行は送信待ちに戻る。
+        登録後に outbox を送信する(--no-drain なら登録のみで、drain_notification_outbox か
+        run_notification_scheduler が送る)。--mode digest (既定) は Webhook ごとに全セミナー・
+        全日数を1つのダイジェストに、seminar はセミナー・日数ごとに1メッセージにまとめる。
+        送信は --concurrency / --per-host / --timeout で並行数とタイムアウトを、--deadline で
+        全体の締切を指定し、失敗・締切超過・レート制限の分は回数に応じて間隔を空けて再送する
+        (NOTIFICATION_OUTBOX_MAX_ATTEMPTS 回で送信失敗)。締切日を過ぎた通知は送信不要として送らない。
+        --dry-run は登録も送信もせず、送られるメッセージを表示する。
         """
         # 引数がなければ実行時のローカル日付を使用
         base_date = self._parse_date(options.get("base_date")) or timezone.localdate()
@@ -45,38 +63,68 @@ class Command(BaseCommand):
         # 実行時コンテキスト（引数が多くならないようインスタンスに保持）
         self._dry_run = bool(options.get("dry_run", False))
         self._override_webhook = options.get("webhook_url")
+        self._mode = options.get("mode") or MODE_DIGEST
         self._sent_guard: Set[Tuple[str, int, int]] = set()  # (url, seminar_id, n)
+        self._entries: List[OutboxEntry] = []
 
-        settings_qs = NotificationSetting.objects.prefetch_related("integrations").all()
-        days_list: List[int] = self._collect_days(settings_qs)
+        # 設定と連携先は1回だけ取得し、日数ごとにメモリ上でまとめる
+        settings_list = list(NotificationSetting.objects.prefetch_related("integrations").order_by("id"))
+        days_list: List[int] = self._collect_days(settings_list)
         if not days_list:
             self.stdout.write(self.style.WARNING("NotificationSetting がありません。処理を終了します。"))
             return
 
         self.stdout.write(
-            f"[send_task_notifications] base_date={base_date} days={days_list} dry_run={self._dry_run}"
+            f"[send_task_notifications] base_date={base_date} days={days_list} mode={self._mode} dry_run={self._dry_run}"
         )
 
+        settings_by_days: Dict[int, List[NotificationSetting]] = defaultdict(list)
+        for ns in settings_list:
+            settings_by_days[int(ns.days_before)].append(ns)
+        webhooks_by_setting: Dict[int, List[str]] = {}
+
+        # 全日数分の対象日のタスクを1クエリで取得する
+        target_dates = {n: base_date + timedelta(days=n) for n in days_list}
+        tasks_by_date = self._get_tasks_for_dates(target_dates.values())
+
         total_to_notify = 0
 
         for n in days_list:
-            target_date = base_date + timedelta(days=int(n))
-            tasks = self._get_tasks_for_day(target_date)
+            target_date = target_dates[n]
+            tasks = tasks_by_date.get(target_date)
             if not tasks:
                 continue
 
             total_to_notify += len(tasks)
             grouped = self._group_tasks_by_seminar(tasks)
 
-            for ns in settings_qs.filter(days_before=n):
-                webhooks = self._resolve_webhooks(ns)
+            for ns in settings_by_days[n]:
+                if ns.pk not in webhooks_by_setting:
+                    webhooks_by_setting[ns.pk] = self._resolve_webhooks(ns)
+                    if not webhooks_by_setting[ns.pk]:
+                        self._warn(f"Webhook未設定のためスキップ: NotificationSetting id={ns.pk}")
+                webhooks = webhooks_by_setting[ns.pk]
                 if not webhooks:
-                    self._warn(f"Webhook未設定のためスキップ: NotificationSetting id={ns.pk}")
                     continue
 
                 for seminar_id, items in grouped.items():
-                    text = self._build_message(items[0].seminar.title, n, target_date, items)
-                    self._send(text, webhooks, ns_id=ns.pk, seminar_id=seminar_id, n=int(n))
+                    title = items[0].seminar.title
+                    self._send(
+                        render_text(title, n, target_date, items),
+                        render_section(title, n, target_date, items),
+                        webhooks,
+                        seminar_id=seminar_id,
+                        target_date=target_date,
+                        n=n,
+                    )
+
+        if self._dry_run:
+            self._preview(base_date)
+        else:
+            # outbox に登録してから送信する(失敗分は drain_notification_outbox が再送)
+            enqueue(self._entries)
+            if not options.get("no_drain"):
+                self.write_drain_report(drain(self.build_delivery(options), mode=self._mode, today=base_date))
 
         if total_to_notify == 0:
             self.stdout.write("対象タスクはありませんでした。")
@@ -92,19 +140,21 @@ class Command(BaseCommand):
         except Exception:
             return None
 
-    def _collect_days(self, settings_qs) -> List[int]:
+    def _collect_days(self, settings_list: Sequence[NotificationSetting]) -> List[int]:
         """NotificationSetting から通知日数(days_before)のユニーク集合を昇順で取得"""
-        days: List[int] = sorted(set(settings_qs.values_list("days_before", flat=True)))
-        return [int(x) for x in days]
+        return sorted({int(ns.days_before) for ns in settings_list})
 
-    def _get_tasks_for_day(self, target_date: _date) -> List[PreparationTask]:
-        """指定日の締切タスク(未完了)を取得。セミナーを select_related 済みで返す"""
+    def _get_tasks_for_dates(self, target_dates: Iterable[_date]) -> Dict[_date, List[PreparationTask]]:
+        """指定日群の締切タスク(未完了)を1クエリで取得し、締切日ごとに返す。セミナーは select_related 済み"""
         qs = (
             PreparationTask.objects.select_related("seminar")
-            .filter(is_done=False, deadline=target_date)
+            .filter(is_done=False, deadline__in=set(target_dates))
             .order_by("seminar_id", "id")
         )
-        return list(qs)
+        tasks: Dict[_date, List[PreparationTask]] = defaultdict(list)
+        for t in qs:
+            tasks[t.deadline].append(t)
+        return tasks
 
     def _group_tasks_by_seminar(self, tasks: Sequence[PreparationTask]) -> Dict[int, List[PreparationTask]]:
         grouped: Dict[int, List[PreparationTask]] = defaultdict(list)
@@ -136,52 +186,51 @@ class Command(BaseCommand):
         # 重複排除し順序維持
         return list(dict.fromkeys(webhooks))
 
-    def _build_message(self, seminar_title: str, n: int, target_date: _date, items: Sequence[PreparationTask]) -> str:
-        header = f"【タスク通知】締切まで{n}日: セミナー『{seminar_title}』 {target_date.isoformat()}"
-        lines = [self._format_task_line(t) for t in items]
-        return header + "\n" + "\n".join(lines)
-
-    def _format_task_line(self, t: PreparationTask) -> str:
-        assignee = (t.assignee or "未設定")
-        return f"・{t.name}（担当: {assignee}）"
-
     def _send(
         self,
         text: str,
+        section: str,
         webhooks: Sequence[str],
         *,
-        ns_id: int,
         seminar_id: int,
+        target_date: _date,
         n: int,
     ) -> None:
+        """送信する通知を登録する(実際の送信は outbox 経由でまとめて行う)"""
         for url in webhooks:
-            print(url)
             key = (url, seminar_id, n)
             if key in self._sent_guard:
                 continue
+            self._sent_guard.add(key)
+            self._entries.append(
+                OutboxEntry(
+                    webhook_url=url,
+                    seminar_id=seminar_id,
+                    target_date=target_date,
+                    days_before=n,
+                    text=text,
+                    section=section,
+                )
+            )
 
-            if self._dry_run:
+    def _preview(self, base_date: _date) -> None:
+        """送信せずに、送信されるメッセージを表示する"""
+        if self._mode == MODE_SEMINAR:
+            for entry in self._entries:
+                self.stdout.write("--- DRY RUN ---")
+                self.stdout.write(f"to: {entry.webhook_url}")
+                self.stdout.write(entry.text)
+            return
+        grouped: Dict[str, List[OutboxEntry]] = defaultdict(list)
+        for entry in self._entries:
+            grouped[entry.webhook_url].append(entry)
+        title = f"【タスク通知】{base_date.isoformat()} の締切が近いタスク"
+        for url, entries in grouped.items():
+            entries.sort(key=lambda entry: (entry.days_before, entry.seminar_id))
+            for message in build_digest(url, title, [entry.section for entry in entries]):
                 self.stdout.write("--- DRY RUN ---")
                 self.stdout.write(f"to: {url}")
-                self.stdout.write(text)
-                ok = True
-            else:
-                ok = bool(post_to_slack(text, webhook_url=url))
-
-            if ok:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"通知済: ns_id={ns_id} seminar_id={seminar_id} items={text.count('・')} n={n}"
-                    )
-                )
-            else:
-                self.stderr.write(
-                    self.style.ERROR(
-                        f"Slack送信失敗: ns_id={ns_id} seminar_id={seminar_id} n={n}"
-                    )
-                )
-
-            self._sent_guard.add(key)
+                self.stdout.write(json.dumps(message.blocks, ensure_ascii=False, indent=2))
 
     def _warn(self, msg: str) -> None:
         self.stderr.write(self.style.WARNING(msg))
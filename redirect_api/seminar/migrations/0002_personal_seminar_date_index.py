@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='personalseminardate',
+            index=models.Index(fields=['seminar', 'date'], name='personal_se_seminar_c4174c_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0002_personal_seminar_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preparationtask',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0003_preparation_task_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='personalseminar',
+            name='task_anchor',
+            field=models.CharField(choices=[('first', '最初の開催日のみ'), ('each', '各開催日')], default='first', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='preparationtask',
+            name='session_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='preparationtask',
+            name='template_task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='generated_tasks', to='seminar.preparationtasktemplate'),
+        ),
+    ]
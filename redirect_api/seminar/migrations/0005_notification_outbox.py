@@ -0,0 +1,43 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0004_seminar_task_anchor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook_url', models.CharField(max_length=500)),
+                ('target_date', models.DateField()),
+                ('days_before', models.IntegerField()),
+                ('text', models.TextField()),
+                ('section', models.TextField()),
+                ('status', models.CharField(choices=[('pending', '送信待ち'), ('sent', '送信済み'), ('failed', '送信失敗')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claim_token', models.CharField(blank=True, max_length=32)),
+                ('claimed_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('seminar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='seminar.personalseminar')),
+            ],
+            options={
+                'db_table': 'notification_outbox',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='notificatio_status_7f28bd_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationoutbox',
+            constraint=models.UniqueConstraint(fields=('webhook_url', 'seminar', 'target_date', 'days_before'), name='notification_outbox_unique_key'),
+        ),
+    ]
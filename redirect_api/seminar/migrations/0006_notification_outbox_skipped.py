@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+def mark_skipped(apps, schema_editor):
+    # 締切切れ・未完了タスク無しで失敗扱いにしていた行を送信不要に移す
+    NotificationOutbox = apps.get_model('seminar', 'NotificationOutbox')
+    NotificationOutbox.objects.filter(status='failed', last_error__in=['expired', 'no open tasks']).update(
+        status='skipped'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seminar', '0005_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', '送信待ち'), ('sent', '送信済み'), ('failed', '送信失敗'), ('skipped', '送信不要')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_skipped, migrations.RunPython.noop),
+    ]
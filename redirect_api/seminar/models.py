@@ -1,9 +1,43 @@
 from __future__ import annotations
 
-from datetime import date as _date
+import sqlite3
+from datetime import date as _date, datetime
 from typing import Optional
 
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import Case, Count, Exists, Max, Min, OuterRef, Q, Value, When
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+
+class PersonalSeminarQuerySet(models.QuerySet):
+    def with_dates(self) -> "PersonalSeminarQuerySet":
+        """開催日の範囲・今後の開催有無を集計し、開催日をprefetchする"""
+        today = _date.today()
+        return self.annotate(
+            annotated_first_date=Min("dates__date"),
+            annotated_last_date=Max("dates__date"),
+            annotated_has_future_dates=Exists(
+                PersonalSeminarDate.objects.filter(seminar=OuterRef("pk"), date__gte=today)
+            ),
+        ).prefetch_related("dates")
+
+    def with_summary(self) -> "PersonalSeminarQuerySet":
+        """一覧表示用に with_dates() に加えてタスク件数を集計する。
+
+        付与した値はモデルのプロパティ(total_tasks_count など)が優先して使用する。
+        """
+        return self.with_dates().annotate(
+            # 開催日とのJOINで行が増えるため件数は distinct で数える
+            annotated_total_tasks=Count("tasks", distinct=True),
+            annotated_completed_tasks=Count("tasks", filter=Q(tasks__is_done=True), distinct=True),
+        )
+
+
+# テンプレートからタスクを作るときの基準日: (値, 表示名)
+TASK_ANCHOR_FIRST = "first"
+TASK_ANCHOR_EACH = "each"
+TASK_ANCHOR_CHOICES = [(TASK_ANCHOR_FIRST, "最初の開催日のみ"), (TASK_ANCHOR_EACH, "各開催日")]
 
 
 class PersonalSeminar(models.Model):
@@ -13,11 +47,16 @@ class PersonalSeminar(models.Model):
     capacity = models.IntegerField(null=True, blank=True)
     price = models.IntegerField(null=True, blank=True)
     format = models.CharField(max_length=50, choices=[("online", "オンライン"), ("offline", "オフライン")])
+    task_anchor = models.CharField(max_length=10, choices=TASK_ANCHOR_CHOICES, default=TASK_ANCHOR_FIRST)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PersonalSeminarQuerySet.as_manager()
+
     def base_date(self) -> Optional[_date]:
         """PersonalSeminarDateの最も早い日付を基準日とする"""
+        if hasattr(self, "annotated_first_date"):
+            return self.annotated_first_date
         first_date = self.dates.order_by("date").first()  # type: ignore[attr-defined]
         return first_date.date if first_date else None
 
@@ -26,10 +65,14 @@ class PersonalSeminar(models.Model):
 
     @property
     def total_tasks_count(self) -> int:
+        if hasattr(self, "annotated_total_tasks"):
+            return self.annotated_total_tasks
         return self.tasks.count()  # type: ignore[attr-defined]
 
     @property
     def completed_tasks_count(self) -> int:
+        if hasattr(self, "annotated_completed_tasks"):
+            return self.annotated_completed_tasks
         return self.tasks.filter(is_done=True).count()  # type: ignore[attr-defined]
 
     @property
@@ -41,6 +84,8 @@ class PersonalSeminar(models.Model):
 
     @property
     def all_dates_past(self) -> bool:
+        if hasattr(self, "annotated_has_future_dates"):
+            return self.annotated_first_date is not None and not self.annotated_has_future_dates
         qs = self.dates.all()  # type: ignore[attr-defined]
         if not qs.exists():
             return False
@@ -49,6 +94,8 @@ class PersonalSeminar(models.Model):
 
     @property
     def has_future_dates(self) -> bool:
+        if hasattr(self, "annotated_has_future_dates"):
+            return self.annotated_has_future_dates
         today = _date.today()
         return self.dates.filter(date__gte=today).exists()  # type: ignore[attr-defined]
 
@@ -69,6 +116,9 @@ class PersonalSeminarDate(models.Model):
 
     class Meta:
         db_table = "personal_seminar_date"
+        indexes = [
+            models.Index(fields=["seminar", "date"]),
+        ]
 
 
 class PreparationTemplate(models.Model):
@@ -121,6 +171,51 @@ class PreparationTaskTemplate(models.Model):
         ordering = ["id"]
 
 
+def _can_return_from_update(alias: str) -> bool:
+    """UPDATE ... RETURNING が使えるか(PostgreSQL / SQLite 3.35以降)"""
+    vendor = connections[alias].vendor
+    return vendor == "postgresql" or (vendor == "sqlite" and sqlite3.sqlite_version_info >= (3, 35))
+
+
+class PreparationTaskQuerySet(models.QuerySet):
+    def toggle_done(self, pk: int, version: Optional[datetime] = None) -> Optional["PreparationTask"]:
+        """is_done を SQL 上で反転し、反転後の状態を返す(読み込み→保存の競合が起きない)。
+
+        version(updated_at)を渡すと、一致する場合だけ更新する。
+        対象が無い・version が一致しない場合は None。
+        戻り値は pk / is_done / deadline / updated_at だけを持つインスタンス。
+        """
+        now = timezone.now()
+        target = self.filter(pk=pk)
+        if version is not None:
+            target = target.filter(updated_at=version)
+        values = {
+            "is_done": Case(When(is_done=True, then=Value(False)), default=Value(True)),
+            "updated_at": now,
+        }
+
+        if _can_return_from_update(self.db):
+            query = target.query.chain(UpdateQuery)
+            query.add_update_values(values)
+            sql, params = query.get_compiler(self.db).as_sql()
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(f"{sql} RETURNING is_done, deadline", params)
+                row = cursor.fetchone()
+        else:
+            with transaction.atomic(using=self.db):
+                row = None
+                if target.update(**values):
+                    row = self.filter(pk=pk).values_list("is_done", "deadline").get()
+        if row is None:
+            return None
+
+        is_done, deadline = row
+        # RETURNING の値はDBの生の値(SQLiteでは 0/1 と文字列)
+        if not isinstance(deadline, _date):
+            deadline = _date.fromisoformat(deadline)
+        return self.model(pk=pk, is_done=bool(is_done), deadline=deadline, updated_at=now)
+
+
 class PreparationTask(models.Model):
     seminar = models.ForeignKey(PersonalSeminar, related_name="tasks", on_delete=models.CASCADE)
     name = models.CharField(max_length=200)
@@ -128,10 +223,23 @@ class PreparationTask(models.Model):
     assignee = models.CharField(max_length=100, blank=True)
     notes = models.TextField(blank=True)
     is_done = models.BooleanField(default=False, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # テンプレートから生成したタスクの元テンプレートと基準にした開催日(日程変更時の再計算用)
+    template_task = models.ForeignKey(
+        PreparationTaskTemplate, related_name="generated_tasks", null=True, blank=True, on_delete=models.SET_NULL
+    )
+    session_date = models.DateField(null=True, blank=True)
+
+    objects = PreparationTaskQuerySet.as_manager()
 
     def __str__(self) -> str:
         return f"{self.name} - {self.deadline}"
 
+    @property
+    def version(self) -> str:
+        """競合検出用のトークン(最終更新日時)"""
+        return self.updated_at.isoformat() if self.updated_at else ""
+
     @property
     def is_overdue(self) -> bool:
         """未完了 かつ 期限超過かどうか"""
@@ -173,3 +281,46 @@ class NotificationSetting(models.Model):
 
     class Meta:
         db_table = "notification_setting"
+
+
+class NotificationOutbox(models.Model):
+    """送信待ちのタスク通知。(Webhook, セミナー, 締切日, 日数) ごとに1行で、再実行しても重複しない"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "送信待ち"
+        SENT = "sent", "送信済み"
+        FAILED = "failed", "送信失敗"
+        # 締切切れ・未完了タスク無しで送る必要が無くなった(失敗ではないので再送しない)
+        SKIPPED = "skipped", "送信不要"
+
+    webhook_url = models.CharField(max_length=500)
+    seminar = models.ForeignKey(PersonalSeminar, related_name="notifications", on_delete=models.CASCADE)
+    target_date = models.DateField()
+    days_before = models.IntegerField()
+    # セミナー単位で送る場合の本文と、ダイジェストに含める場合の本文(mrkdwn)
+    text = models.TextField()
+    section = models.TextField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # 送信中のワーカーの識別子と期限(期限切れなら別のワーカーが引き継ぐ)
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.seminar_id} {self.target_date} ({self.days_before}日前) [{self.status}]"
+
+    class Meta:
+        db_table = "notification_outbox"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["webhook_url", "seminar", "target_date", "days_before"],
+                name="notification_outbox_unique_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
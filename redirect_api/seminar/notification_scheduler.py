@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def schedule_timezone() -> str:
+    return _setting("NOTIFICATION_SCHEDULE_TIMEZONE", "Asia/Tokyo")
+
+
+def schedule_time() -> str:
+    return _setting("NOTIFICATION_SCHEDULE_TIME", "09:00")
+
+
+def max_catchup_days() -> int:
+    return int(_setting("NOTIFICATION_SCHEDULER_MAX_CATCHUP_DAYS", 7))
+
+
+def default_state_file() -> Path:
+    # ソースツリーではなく実行時データ用の var/ に置く(.gitignore 済み)
+    return Path(
+        _setting("NOTIFICATION_SCHEDULER_STATE_FILE", Path(settings.BASE_DIR) / "var" / "notification_scheduler.json")
+    )
+
+
+def parse_time(value: str) -> time:
+    """"HH:MM" 形式の時刻を解釈する"""
+    hour, minute = value.strip().split(":")
+    return time(int(hour), int(minute))
+
+
+def latest_due_date(now_local: datetime, at: time) -> date:
+    """now_local の時点で実行時刻を過ぎている最も新しい日付"""
+    today = now_local.date()
+    return today if now_local.time() >= at else today - timedelta(days=1)
+
+
+def due_dates(now_local: datetime, at: time, watermark: Optional[date], max_catchup: int) -> List[date]:
+    """まだ実行していない基準日(昇順)。
+
+    watermark(最後に実行した基準日)の翌日から最新の実行日までを返す。停止が長い場合は
+    直近 max_catchup 日分だけを取り戻す。watermark が無い(初回起動)なら最新の1日だけ。
+    """
+    latest = latest_due_date(now_local, at)
+    if watermark is None:
+        return [latest]
+    start = max(watermark + timedelta(days=1), latest - timedelta(days=max(1, max_catchup) - 1))
+    return [start + timedelta(days=i) for i in range((latest - start).days + 1)]
+
+
+@dataclass
+class SchedulerState:
+    """常駐スケジューラの状態(最後に実行した基準日と稼働状況)。
+
+    JSON ファイルに保存し、再起動後の取り戻しと外部からの死活監視に使う。
+    """
+
+    last_run_date: Optional[date] = None
+    status: str = "starting"
+    pid: int = 0
+    started_at: str = ""
+    heartbeat_at: str = ""
+    next_run_at: str = ""
+    last_success_at: str = ""
+    last_error: str = ""
+    runs: int = 0
+    failures: int = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "SchedulerState":
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls()
+        known = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        if known.get("last_run_date"):
+            try:
+                known["last_run_date"] = date.fromisoformat(known["last_run_date"])
+            except (TypeError, ValueError):
+                known["last_run_date"] = None
+        return cls(**known)
+
+    def save(self, path: Path) -> None:
+        """一時ファイルに書いてから置き換える(読み手が途中の内容を見ないように)"""
+        data = asdict(self)
+        data["last_run_date"] = self.last_run_date.isoformat() if self.last_run_date else None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
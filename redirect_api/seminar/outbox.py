@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import random
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import NotificationOutbox, PreparationTask
+from .slack import DeliveryResult, SlackDelivery, SlackMessage, build_digest
+
+
+# 送信モード
+MODE_DIGEST = "digest"
+MODE_SEMINAR = "seminar"
+
+Status = NotificationOutbox.Status
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+@dataclass
+class OutboxEntry:
+    webhook_url: str
+    seminar_id: int
+    target_date: date
+    days_before: int
+    text: str
+    section: str
+
+
+@dataclass
+class DrainReport:
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    skipped: int = 0
+    # (送信したメッセージ, 結果, 対象の行)
+    deliveries: List[tuple] = field(default_factory=list)
+
+
+def _format_task_line(task: PreparationTask) -> str:
+    assignee = task.assignee or "未設定"
+    return f"・{task.name}（担当: {assignee}）"
+
+
+def render_text(seminar_title: str, n: int, target_date: date, tasks: Sequence[PreparationTask]) -> str:
+    """セミナー・日数ごとに送る場合の本文"""
+    header = f"【タスク通知】締切まで{n}日: セミナー『{seminar_title}』 {target_date.isoformat()}"
+    return header + "\n" + "\n".join(_format_task_line(task) for task in tasks)
+
+
+def render_section(seminar_title: str, n: int, target_date: date, tasks: Sequence[PreparationTask]) -> str:
+    """ダイジェスト内の1セミナー・1日数分の本文(mrkdwn)"""
+    header = f"*締切まで{n}日* セミナー『{seminar_title}』 {target_date.isoformat()}"
+    return header + "\n" + "\n".join(_format_task_line(task) for task in tasks)
+
+
+def enqueue(entries: Iterable[OutboxEntry]) -> int:
+    """通知を outbox に登録する。
+
+    同じ (Webhook, セミナー, 締切日, 日数) が既にあれば本文だけ更新するため、
+    再実行しても二重に送信されない(送信済みの行は送り直さない)。
+    送信失敗で終わった行は送信待ちに戻す(Webhook を直してから再実行すれば送られる)。送信不要の行は戻さない。
+    """
+    rows = [
+        NotificationOutbox(
+            webhook_url=entry.webhook_url,
+            seminar_id=entry.seminar_id,
+            target_date=entry.target_date,
+            days_before=entry.days_before,
+            text=entry.text,
+            section=entry.section,
+        )
+        for entry in entries
+    ]
+    if not rows:
+        return 0
+    _reset_failed(rows)
+    NotificationOutbox.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["webhook_url", "seminar", "target_date", "days_before"],
+        update_fields=["text", "section"],
+    )
+    return len(rows)
+
+
+def _reset_failed(rows: Sequence[NotificationOutbox]) -> None:
+    keys = {(row.webhook_url, row.seminar_id, row.target_date, row.days_before) for row in rows}
+    candidates = NotificationOutbox.objects.filter(
+        status=Status.FAILED,
+        seminar_id__in={row.seminar_id for row in rows},
+        target_date__in={row.target_date for row in rows},
+    ).values_list("id", "webhook_url", "seminar_id", "target_date", "days_before")
+    ids = [pk for pk, *key in candidates if tuple(key) in keys]
+    if ids:
+        NotificationOutbox.objects.filter(pk__in=ids).update(
+            status=Status.PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            last_error="",
+            claim_token="",
+            claimed_until=None,
+        )
+
+
+def backoff_delay(attempts: int, retry_after: Optional[float] = None) -> timedelta:
+    """指数バックオフ(ゆらぎ付き)。429 の Retry-After がそれより長ければそちらを使う"""
+    base = float(_setting("NOTIFICATION_OUTBOX_BACKOFF_BASE", 60.0))
+    cap = float(_setting("NOTIFICATION_OUTBOX_BACKOFF_MAX", 6 * 3600.0))
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    delay = delay * random.uniform(0.8, 1.2)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return timedelta(seconds=delay)
+
+
+def _is_permanent(result: DeliveryResult) -> bool:
+    # Webhook の削除・不正なペイロードなど、再送しても成功しない応答
+    return result.status is not None and 400 <= result.status < 500 and result.status not in (408, 429)
+
+
+def claim(limit: int, lease: timedelta, now: Optional[datetime] = None) -> List[NotificationOutbox]:
+    """送信期限の来た行を最大 limit 件確保する。
+
+    確保は claim_token / claimed_until で行い、期限内に結果を書き戻さなかった
+    (プロセスが落ちた)行は期限切れ後に別の実行が引き継ぐ。
+    """
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    available = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+    due = NotificationOutbox.objects.filter(available, status=Status.PENDING, next_attempt_at__lte=now)
+    with transaction.atomic():
+        ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        # 同時に動く別の実行と取り合った行は条件付き UPDATE で片方だけが確保する
+        due.filter(id__in=ids).update(claim_token=token, claimed_until=now + lease)
+    return list(NotificationOutbox.objects.filter(claim_token=token).order_by("id"))
+
+
+def drain(
+    delivery: SlackDelivery,
+    *,
+    mode: str = MODE_DIGEST,
+    limit: int = 1000,
+    now: Optional[datetime] = None,
+    today: Optional[date] = None,
+) -> DrainReport:
+    """outbox の送信待ちを送信し、結果(送信済み・再送予定・失敗・送信不要)を書き戻す。
+
+    today は締切切れの判定とダイジェストの見出しに使う日付(既定はローカル日付)。
+    締切切れ・未完了タスクの無い行は送信不要(SKIPPED)として終え、失敗には数えない。
+    """
+    now = now or timezone.now()
+    report = DrainReport()
+    lease = timedelta(seconds=delivery.deadline + 60)
+    max_attempts = int(_setting("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", 8))
+
+    rows = claim(limit, lease, now)
+    if not rows:
+        return report
+
+    # 停止中に締切日を過ぎた通知は送らない
+    today = today or timezone.localdate(now)
+    expired = [row for row in rows if row.target_date < today]
+    if expired:
+        _finish(expired, Status.SKIPPED, now, error="expired")
+        report.skipped += len(expired)
+    live = [row for row in rows if row.target_date >= today]
+
+    # 通知日(締切日 - 日数)を過ぎて送る行は、残り日数と未完了のタスクで本文を作り直す
+    late = [row for row in live if row.target_date - timedelta(days=row.days_before) < today]
+    if late:
+        resolved = _refresh_late(late, today)
+        if resolved:
+            _finish(resolved, Status.SKIPPED, now, error="no open tasks")
+            report.skipped += len(resolved)
+            live = [row for row in live if row not in resolved]
+
+    messages: List[SlackMessage] = []
+    targets: List[List[NotificationOutbox]] = []
+    if mode == MODE_DIGEST:
+        grouped: Dict[str, List[NotificationOutbox]] = defaultdict(list)
+        for row in live:
+            grouped[row.webhook_url].append(row)
+        for url, group in grouped.items():
+            # 締切の近い順、同じ日数ならセミナー順に並べる
+            group.sort(key=lambda row: (row.days_before, row.seminar_id))
+            title = f"【タスク通知】{today.isoformat()} の締切が近いタスク"
+            for message in build_digest(url, title, [row.section for row in group], label=f"{len(group)}件"):
+                messages.append(message)
+                targets.append([group[index] for index in message.sources])
+    else:
+        for row in live:
+            messages.append(SlackMessage(url=row.webhook_url, text=row.text))
+            targets.append([row])
+
+    results = delivery.deliver(messages)
+
+    # 行ごとの結果を集める(ダイジェストが分割された行は全ページ成功で送信済み)
+    outcome: Dict[int, DeliveryResult] = {}
+    for message, result, group in zip(messages, results, targets):
+        report.deliveries.append((message, result, group))
+        for row in group:
+            previous = outcome.get(row.pk)
+            if previous is None or previous.ok:
+                outcome[row.pk] = result
+
+    sent = [row for row in live if outcome[row.pk].ok]
+    _finish(sent, Status.SENT, now)
+    report.sent += len(sent)
+
+    retry: List[NotificationOutbox] = []
+    failed: List[NotificationOutbox] = []
+    for row in live:
+        result = outcome[row.pk]
+        if result.ok:
+            continue
+        row.attempts += 1
+        row.last_error = result.error[:1000]
+        row.claim_token, row.claimed_until = "", None
+        if _is_permanent(result) or row.attempts >= max_attempts:
+            row.status = Status.FAILED
+            failed.append(row)
+        else:
+            row.next_attempt_at = now + backoff_delay(row.attempts, result.retry_after)
+            retry.append(row)
+    NotificationOutbox.objects.bulk_update(
+        retry + failed,
+        ["attempts", "last_error", "status", "next_attempt_at", "claim_token", "claimed_until"],
+        batch_size=500,
+    )
+    report.retried += len(retry)
+    report.failed += len(failed)
+    return report
+
+
+def _refresh_late(rows: Sequence[NotificationOutbox], today: date) -> List[NotificationOutbox]:
+    """遅れて送る行の本文を作り直す。対象のタスクがすべて完了していた行を返す"""
+    tasks: Dict[tuple, List[PreparationTask]] = defaultdict(list)
+    open_tasks = (
+        PreparationTask.objects.select_related("seminar")
+        .filter(
+            is_done=False,
+            seminar_id__in={row.seminar_id for row in rows},
+            deadline__in={row.target_date for row in rows},
+        )
+        .order_by("seminar_id", "id")
+    )
+    for task in open_tasks:
+        tasks[(task.seminar_id, task.deadline)].append(task)
+
+    resolved: List[NotificationOutbox] = []
+    refreshed: List[NotificationOutbox] = []
+    for row in rows:
+        items = tasks.get((row.seminar_id, row.target_date))
+        if not items:
+            resolved.append(row)
+            continue
+        title = items[0].seminar.title
+        remaining = (row.target_date - today).days
+        row.text = render_text(title, remaining, row.target_date, items)
+        row.section = render_section(title, remaining, row.target_date, items)
+        refreshed.append(row)
+    NotificationOutbox.objects.bulk_update(refreshed, ["text", "section"], batch_size=500)
+    return resolved
+
+
+def _finish(rows: Sequence[NotificationOutbox], status: str, now: datetime, error: str = "") -> None:
+    if not rows:
+        return
+    NotificationOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+        status=status,
+        sent_at=now if status == Status.SENT else None,
+        last_error=error,
+        claim_token="",
+        claimed_until=None,
+    )
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
 from datetime import date
 from typing import Any, Dict, Optional, Tuple
 
+from django.db import transaction
+from django.db.models import Case, Value, When
 from django.http import HttpRequest, HttpResponse, JsonResponse, QueryDict
-from django.shortcuts import redirect
+from django.contrib import messages
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.generic import CreateView, DeleteView, ListView, UpdateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from .copying import copy_template, merge_templates
 from .forms import PreparationTemplateForm
 from .models import PreparationTask, PreparationTaskTemplate, PreparationTemplate, PersonalSeminar
 from .utils import (
@@ -93,19 +100,38 @@ def _validate_task_template_payload(post_data: QueryDict) -> Tuple[Optional[Task
 
 class ToggleTaskAjaxView(LoginRequiredMixin, View):
     def post(self, request: HttpRequest, pk: int) -> JsonResponse:
+        # version(前回の応答の値)を送ると、その後に他で変更されていれば 409 を返す
+        version_raw = (request.POST.get("version") or "").strip()
         try:
-            task = PreparationTask.objects.get(pk=pk)
-        except PreparationTask.DoesNotExist:
-            return JsonResponse({"success": False, "error": "Task not found"}, status=404)
-
-        task.is_done = not task.is_done
-        task.save()
+            version = parse_datetime(version_raw) if version_raw else None
+        except ValueError:
+            # 形式は正しいが存在しない日時(13月など)
+            version = None
+        # updated_at はタイムゾーン付きなので、タイムゾーンの無い値は比較せずに弾く
+        if version_raw and (version is None or timezone.is_naive(version)):
+            return JsonResponse({"success": False, "error": "Invalid version"}, status=400)
+
+        task = PreparationTask.objects.toggle_done(pk, version)
+        if task is None:
+            current = PreparationTask.objects.filter(pk=pk).only("is_done", "deadline", "updated_at").first()
+            if current is None:
+                return JsonResponse({"success": False, "error": "Task not found"}, status=404)
+            return JsonResponse(
+                {
+                    "success": False,
+                    "error": "Task was modified",
+                    "is_done": current.is_done,
+                    "is_overdue": current.is_overdue,
+                    "version": current.version,
+                },
+                status=409,
+            )
 
-        serialized = serialize_task(task)
         return JsonResponse({
             "success": True,
-            "is_done": serialized["is_done"],
-            "is_overdue": serialized["is_overdue"],
+            "is_done": task.is_done,
+            "is_overdue": task.is_overdue,
+            "version": task.version,
         })
 
 
@@ -150,6 +176,137 @@ class CreateTaskAjaxView(LoginRequiredMixin, View):
 
 
 
+# バッチAPIで受け付ける操作と1リクエストあたりの上限
+TASK_BATCH_OPS = ("create", "toggle", "set_done", "update", "delete")
+TASK_BATCH_MAX_OPERATIONS = 500
+
+
+class BatchTaskAjaxView(LoginRequiredMixin, View):
+    """セミナーのタスクへの複数の操作を1リクエスト・1トランザクションで適用する。
+
+    リクエスト本文(JSON): {"operations": [{"op": "create", "name": ..., "deadline": ...},
+    {"op": "toggle", "id": ...}, {"op": "set_done", "id": ..., "is_done": true},
+    {"op": "update", "id": ..., "name": ..., "deadline": ...}, {"op": "delete", "id": ...}]}
+    同じタスクへの操作は順に適用し、書き込みは変更した列だけを操作の種類ごとにまとめて行う。
+    1件でも不正な操作があれば何も保存せず、操作ごとのエラーを返す。
+    """
+
+    def post(self, request: HttpRequest, seminar_id: int) -> JsonResponse:
+        if not PersonalSeminar.objects.filter(pk=seminar_id).exists():
+            return JsonResponse({"success": False, "error": "Seminar not found"}, status=404)
+        try:
+            operations = json.loads(request.body or b"{}").get("operations")
+        except (ValueError, AttributeError):
+            operations = None
+        if not isinstance(operations, list) or not operations:
+            return JsonResponse({"success": False, "error": "operations を配列で指定してください"}, status=400)
+        if len(operations) > TASK_BATCH_MAX_OPERATIONS:
+            return JsonResponse(
+                {"success": False, "error": f"操作は{TASK_BATCH_MAX_OPERATIONS}件以内で指定してください"}, status=400
+            )
+
+        errors: Dict[int, Any] = {}
+        payloads: Dict[int, TaskPayload] = {}
+        task_ids = set()
+        for index, operation in enumerate(operations):
+            op = operation.get("op") if isinstance(operation, dict) else None
+            if op not in TASK_BATCH_OPS:
+                errors[index] = "不明な操作です"
+                continue
+            if op != "create":
+                task_id = operation.get("id")
+                # JSON の true / false は int として扱わない
+                if not isinstance(task_id, int) or isinstance(task_id, bool):
+                    errors[index] = "id を指定してください"
+                    continue
+                task_ids.add(task_id)
+            if op in ("create", "update"):
+                payload, payload_errors = _validate_task_payload(
+                    {key: str(operation.get(key) or "") for key in ("name", "deadline")}  # type: ignore[arg-type]
+                )
+                if payload_errors or payload is None:
+                    errors[index] = payload_errors
+                    continue
+                payloads[index] = payload
+            if op == "set_done" and not isinstance(operation.get("is_done"), bool):
+                errors[index] = "is_done を true / false で指定してください"
+
+        with transaction.atomic():
+            tasks = PreparationTask.objects.select_for_update().filter(seminar_id=seminar_id).in_bulk(task_ids)
+            for index, operation in enumerate(operations):
+                if index not in errors and operation["op"] != "create" and operation["id"] not in tasks:
+                    errors[index] = "Task not found"
+            if errors:
+                return JsonResponse({"success": False, "errors": errors}, status=400)
+
+            created: Dict[int, PreparationTask] = {}
+            renamed: Dict[int, TaskPayload] = {}
+            # 完了状態: set_done があれば最終的な値、toggle だけなら反転するかどうか
+            done_values: Dict[int, bool] = {}
+            flips: Dict[int, bool] = {}
+            deleted = set()
+            for index, operation in enumerate(operations):
+                op = operation["op"]
+                if op == "create":
+                    payload = payloads[index]
+                    created[index] = PreparationTask(seminar_id=seminar_id, name=payload.name, deadline=payload.deadline)
+                    continue
+                pk = operation["id"]
+                if op == "delete":
+                    deleted.add(pk)
+                elif op == "toggle":
+                    if pk in done_values:
+                        done_values[pk] = not done_values[pk]
+                    else:
+                        flips[pk] = not flips.get(pk, False)
+                elif op == "set_done":
+                    done_values[pk] = operation["is_done"]
+                    flips.pop(pk, None)
+                else:
+                    renamed[pk] = payloads[index]
+
+            # 操作で変わった列だけを書き込む(読み込んだ値で他の列を上書きしない)
+            now = timezone.now()
+            renamed_tasks = []
+            for pk, payload in renamed.items():
+                if pk in deleted:
+                    continue
+                task = tasks[pk]
+                task.name, task.deadline = payload.name, payload.deadline
+                # bulk_update では auto_now が効かないため明示する
+                task.updated_at = now
+                renamed_tasks.append(task)
+            PreparationTask.objects.bulk_update(renamed_tasks, ["name", "deadline", "updated_at"], batch_size=500)
+            for is_done in (True, False):
+                ids = [pk for pk, value in done_values.items() if value is is_done and pk not in deleted]
+                if ids:
+                    PreparationTask.objects.filter(pk__in=ids).update(is_done=is_done, updated_at=now)
+            flipped = [pk for pk, flip in flips.items() if flip and pk not in deleted]
+            if flipped:
+                # toggle は現在の値を SQL 上で反転する
+                PreparationTask.objects.filter(pk__in=flipped).update(
+                    is_done=Case(When(is_done=True, then=Value(False)), default=Value(True)),
+                    updated_at=now,
+                )
+            if deleted:
+                PreparationTask.objects.filter(pk__in=deleted).delete()
+            PreparationTask.objects.bulk_create(list(created.values()), batch_size=500)
+
+            # 応答には書き込み後の値を返す
+            changed = (set(renamed) | set(done_values) | set(flipped)) - deleted
+            if changed:
+                tasks.update(PreparationTask.objects.in_bulk(changed))
+
+        results = []
+        for index, operation in enumerate(operations):
+            task = created.get(index) or tasks[operation["id"]]
+            if task.pk in deleted:
+                results.append({"pk": task.pk, "deleted": True})
+            else:
+                results.append(serialize_task(task))
+        return JsonResponse({"success": True, "results": results})
+
+
 class TemplateListView(LoginRequiredMixin, ListView):
     model = PreparationTemplate
     template_name = "preparation/template_list.html"
@@ -187,20 +344,25 @@ class TemplateDeleteView(LoginRequiredMixin, DeleteView):
 
 class TemplateCopyView(LoginRequiredMixin, View):
     def post(self, request: HttpRequest, pk: int) -> HttpResponse:
-        src = PreparationTemplate.objects.get(pk=pk)
-        new = PreparationTemplate.objects.create(
-            name=f"{src.name}（複製）",
-            description=src.description,
-        )
+        src = get_object_or_404(PreparationTemplate, pk=pk)
         # タスクも複製（順序は撤廃したため単純コピー）
-        for t in src.tasks.all().order_by("id"):  # type: ignore[attr-defined]
-            PreparationTaskTemplate.objects.create(
-                template=new,
-                name=t.name,
-                relative_days_before=t.relative_days_before,
-                default_assignee=t.default_assignee,
-                default_notes=t.default_notes,
-            )
+        new = copy_template(src)
+        return redirect("seminar:template_update", pk=new.pk)
+
+
+class TemplateMergeView(LoginRequiredMixin, View):
+    """選択した複数のテンプレートを統合した新しいテンプレートを作る"""
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        ids = [int(value) for value in request.POST.getlist("template_ids") if value.isdigit()]
+        by_id = PreparationTemplate.objects.in_bulk(ids)
+        # 選択した順に統合する(重複は先のテンプレートを優先)
+        sources = [by_id[template_id] for template_id in dict.fromkeys(ids) if template_id in by_id]
+        if len(sources) < 2:
+            messages.error(request, "統合するテンプレートを2つ以上選択してください")
+            return redirect("seminar:template_list")
+        name = (request.POST.get("name") or "").strip()[:100] or "＋".join(source.name for source in sources)[:100]
+        new = merge_templates(sources, name)
         return redirect("seminar:template_update", pk=new.pk)
 
 
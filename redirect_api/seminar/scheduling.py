@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    TASK_ANCHOR_FIRST,
+    PersonalSeminar,
+    PreparationTask,
+    PreparationTaskTemplate,
+    PreparationTemplate,
+)
+
+
+# 同じセミナー内で「同じタスク」とみなすキー: (タスク名, 締切日)
+TaskKey = Tuple[str, date]
+
+
+@dataclass
+class RescheduleResult:
+    moved: int = 0
+    created: int = 0
+    deleted: int = 0
+
+
+def anchor_dates(session_dates: Iterable[date], anchor: str) -> List[date]:
+    """タスクの基準にする開催日(昇順)。first なら最も早い開催日だけを返す"""
+    ordered = sorted(set(session_dates))
+    return ordered[:1] if anchor == TASK_ANCHOR_FIRST else ordered
+
+
+def _dated_templates(task_templates: Iterable[PreparationTaskTemplate]) -> List[PreparationTaskTemplate]:
+    # 相対日のみを利用(日付がないタスクはスキップ)
+    return [task_template for task_template in task_templates if task_template.relative_days_before is not None]
+
+
+def used_task_templates(seminar: PersonalSeminar) -> List[PreparationTaskTemplate]:
+    """セミナーのタスク生成に使われたテンプレートタスク(相対日のあるもの)"""
+    return _dated_templates(PreparationTaskTemplate.objects.filter(generated_tasks__seminar=seminar).distinct())
+
+
+def _existing_keys(seminar_ids: Iterable[int]) -> Dict[int, Set[TaskKey]]:
+    keys: Dict[int, Set[TaskKey]] = {}
+    rows = PreparationTask.objects.filter(seminar_id__in=list(seminar_ids)).values_list("seminar_id", "name", "deadline")
+    for seminar_id, name, deadline in rows:
+        keys.setdefault(seminar_id, set()).add((name, deadline))
+    return keys
+
+
+def plan_tasks(
+    seminar: PersonalSeminar,
+    task_templates: Sequence[PreparationTaskTemplate],
+    anchors: Iterable[date],
+    existing: Optional[Set[TaskKey]] = None,
+) -> List[PreparationTask]:
+    """開催日ごとにタスクをメモリ上で組み立てる(保存はしない)。
+
+    同じ名前・同じ締切日のタスクは既存分も含めて1件にまとめる。
+    """
+    seen: Set[TaskKey] = set(existing or ())
+    tasks: List[PreparationTask] = []
+    for anchor in anchors:
+        for task_template in task_templates:
+            deadline = anchor + timedelta(days=task_template.relative_days_before)  # type: ignore[operator]
+            key = (task_template.name, deadline)
+            if key in seen:
+                continue
+            seen.add(key)
+            tasks.append(
+                PreparationTask(
+                    seminar=seminar,
+                    name=task_template.name,
+                    deadline=deadline,
+                    assignee=task_template.default_assignee,
+                    notes=task_template.default_notes,
+                    template_task=task_template,
+                    session_date=anchor,
+                )
+            )
+    return tasks
+
+
+def generate_tasks(
+    session_dates: Mapping[PersonalSeminar, Iterable[date]], template: PreparationTemplate
+) -> List[PreparationTask]:
+    """テンプレートのタスクを複数のセミナーへまとめて生成する(bulk_create 1回)。
+
+    session_dates は セミナー -> 開催日。基準にする開催日は各セミナーの task_anchor に従う。
+    """
+    task_templates = _dated_templates(template.tasks.all())  # type: ignore[attr-defined]
+    if not task_templates or not session_dates:
+        return []
+    existing = _existing_keys(seminar.pk for seminar in session_dates)
+    tasks: List[PreparationTask] = []
+    for seminar, dates in session_dates.items():
+        anchors = anchor_dates(dates, seminar.task_anchor)
+        tasks.extend(plan_tasks(seminar, task_templates, anchors, existing.get(seminar.pk)))
+    if not tasks:
+        return []
+    with transaction.atomic():
+        return PreparationTask.objects.bulk_create(tasks, batch_size=500)
+
+
+def reschedule_tasks(
+    seminar: PersonalSeminar,
+    old_dates: Iterable[date],
+    new_dates: Iterable[date],
+    old_anchor: Optional[str] = None,
+) -> RescheduleResult:
+    """開催日の変更に合わせてテンプレート由来のタスクを差分で更新する。
+
+    - 変更の無い開催日のタスクはそのまま
+    - 無くなった開催日と追加された開催日を日付順に対応付け、締切日を差分だけずらす(bulk_update)
+    - 対応先の無い開催日の未完了タスクは削除し、新しい開催日には使用中のテンプレートから生成する
+    - ずらした結果、既存のタスクと同じ名前・締切日になったものは既存の方に1件にまとめる
+    - 無くなった開催日の完了済みタスクは残し、開催日との紐づけ(session_date)を外す
+    手動で追加したタスク(template_task なし)は対象外。
+    """
+    result = RescheduleResult()
+    old_anchors = anchor_dates(old_dates, old_anchor or seminar.task_anchor)
+    new_anchors = anchor_dates(new_dates, seminar.task_anchor)
+    removed = [d for d in old_anchors if d not in set(new_anchors)]
+    added = [d for d in new_anchors if d not in set(old_anchors)]
+    if not removed and not added:
+        return result
+
+    moves = dict(zip(removed, added))
+    dropped = removed[len(moves):]
+    fresh = added[len(moves):]
+    generated = PreparationTask.objects.filter(seminar=seminar, template_task__isnull=False)
+    now = timezone.now()
+
+    with transaction.atomic():
+        if dropped:
+            result.deleted, _ = generated.filter(session_date__in=dropped, is_done=False).delete()
+            generated.filter(session_date__in=dropped).update(session_date=None, updated_at=now)
+
+        if moves:
+            tasks = list(
+                generated.filter(session_date__in=list(moves))
+                .order_by("id")
+                .only("id", "name", "deadline", "session_date", "is_done")
+            )
+            # ずらさないタスクの (名前, 締切日) -> id
+            taken: Dict[TaskKey, int] = {
+                (name, deadline): pk
+                for pk, name, deadline in PreparationTask.objects.filter(seminar=seminar)
+                .exclude(pk__in=[task.pk for task in tasks])
+                .values_list("id", "name", "deadline")
+            }
+            kept: List[PreparationTask] = []
+            duplicates: List[int] = []
+            done_ids: Set[int] = set()
+            for task in tasks:
+                new_anchor = moves[task.session_date]  # type: ignore[index]
+                task.deadline += new_anchor - task.session_date  # type: ignore[operator]
+                task.session_date = new_anchor
+                key = (task.name, task.deadline)
+                if key in taken:
+                    duplicates.append(task.pk)
+                    # 完了状態はまとめ先に引き継ぐ
+                    if task.is_done:
+                        done_ids.add(taken[key])
+                    continue
+                taken[key] = task.pk
+                # bulk_update では auto_now が効かないため明示する
+                task.updated_at = now
+                kept.append(task)
+            PreparationTask.objects.bulk_update(kept, ["deadline", "session_date", "updated_at"], batch_size=500)
+            if duplicates:
+                deleted, _ = PreparationTask.objects.filter(pk__in=duplicates).delete()
+                result.deleted += deleted
+            if done_ids:
+                PreparationTask.objects.filter(pk__in=done_ids, is_done=False).update(is_done=True, updated_at=now)
+            result.moved = len(kept)
+
+        if fresh:
+            # セミナーで使用中のテンプレートタスクを新しい開催日にも適用する
+            task_templates = used_task_templates(seminar)
+            existing = _existing_keys([seminar.pk]).get(seminar.pk)
+            tasks = plan_tasks(seminar, task_templates, fresh, existing)
+            PreparationTask.objects.bulk_create(tasks, batch_size=500)
+            result.created = len(tasks)
+    return result
@@ -1,114 +1,252 @@
 from __future__ import annotations
 
-from collections import defaultdict
-from datetime import date
-from typing import Any, Dict, List, Tuple
-
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from django.db import transaction
+from django.db.models import DateField, F, OuterRef, Q, QuerySet, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.forms import BaseModelForm
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, DetailView, ListView, UpdateView
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.generic import CreateView, DetailView, ListView, UpdateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from .models import (
-    PreparationTask,
     PreparationTemplate,
     PersonalSeminar,
     PersonalSeminarDate,
 )
-from .utils import create_tasks_from_template, describe_relative_days, parse_date_input
+from .copying import clone_seminar
+from .scheduling import reschedule_tasks
+from .utils import (
+    CALENDAR_MAX_DAYS,
+    calendar_etag,
+    calendar_events_for,
+    create_tasks_from_template,
+    parse_date_input,
+    task_summary_for,
+)
+
+
+# 一覧の表示期間: (値, 表示名)
+SEMINAR_WHEN_CHOICES: List[Tuple[str, str]] = [("upcoming", "開催予定"), ("past", "過去"), ("all", "すべて")]
+SEMINAR_PAGE_SIZE = 20
+# 「すべて」で開催予定日の無いセミナーを末尾に並べるための番兵
+_FAR_FUTURE = date(9999, 12, 31)
+
+
+@dataclass
+class SeminarListFilter:
+    when: str
+    format: str
+    q: str
+
+    def as_query(self) -> Dict[str, str]:
+        return {key: value for key, value in vars(self).items() if value}
+
+
+def _parse_cursor(raw: Optional[str]) -> Optional[Tuple[date, int]]:
+    """「YYYY-MM-DD.id」形式のカーソルを (日付, id) に変換。不正なら None"""
+    if not raw:
+        return None
+    date_part, _, id_part = raw.partition(".")
+    parsed = parse_date_input(date_part)
+    if parsed is None or not id_part.isdigit():
+        return None
+    return parsed, int(id_part)
 
 
 class PersonalSeminarListView(LoginRequiredMixin, ListView):
+    """セミナー一覧。次回開催日順のキーセットページネーション。
+
+    並び順は (並び替え日付, id) で、カーソルには前ページ末尾のその組を渡す。
+    OFFSET を使わないため、過去のセミナーが増えても表示件数分だけを読む。
+    - upcoming: 次回開催日の昇順(既定)
+    - past: 最終開催日の降順
+    - all: 次回開催日の昇順。開催予定が無いものは末尾
+    """
+
     model = PersonalSeminar
     template_name = "seminar/personal_seminar_list.html"
+    page_size = SEMINAR_PAGE_SIZE
+
+    def get_filter(self) -> SeminarListFilter:
+        params = self.request.GET
+        when = params.get("when") or "upcoming"
+        if when not in dict(SEMINAR_WHEN_CHOICES):
+            when = "upcoming"
+        seminar_format = params.get("format") or ""
+        if seminar_format not in dict(PersonalSeminar._meta.get_field("format").choices):
+            seminar_format = ""
+        return SeminarListFilter(when=when, format=seminar_format, q=(params.get("q") or "").strip())
+
+    def get_queryset(self) -> List[PersonalSeminar]:
+        self.list_filter = self.get_filter()
+        today = date.today()
+        # 次回・最終開催日は相関サブクエリで求める。集計(GROUP BY)を使わないため
+        # キーセットの条件も WHERE に入り、(seminar, date) インデックスで1行ずつ引ける
+        session_dates = PersonalSeminarDate.objects.filter(seminar=OuterRef("pk")).values("date")
+        qs: QuerySet = PersonalSeminar.objects.annotate(
+            next_date=Subquery(session_dates.filter(date__gte=today).order_by("date")[:1]),
+            last_date=Subquery(session_dates.order_by("-date")[:1]),
+        )
+
+        if self.list_filter.format:
+            qs = qs.filter(format=self.list_filter.format)
+        if self.list_filter.q:
+            qs = qs.filter(Q(title__icontains=self.list_filter.q) | Q(location__icontains=self.list_filter.q))
+
+        self.descending = False
+        if self.list_filter.when == "upcoming":
+            qs = qs.filter(next_date__isnull=False).annotate(sort_date=F("next_date"))
+        elif self.list_filter.when == "past":
+            qs = qs.filter(next_date__isnull=True, last_date__isnull=False).annotate(sort_date=F("last_date"))
+            self.descending = True
+        else:
+            qs = qs.annotate(sort_date=Coalesce("next_date", Value(_FAR_FUTURE), output_field=DateField()))
+
+        after = _parse_cursor(self.request.GET.get("after"))
+        before = None if after else _parse_cursor(self.request.GET.get("before"))
+        # 前ページへ戻る場合は逆順に読み、最後に並べ直す
+        backwards = before is not None
+        position = after or before
+        if position is not None:
+            sort_date, pk = position
+            ahead = self.descending == backwards
+            if ahead:
+                qs = qs.filter(Q(sort_date__gt=sort_date) | Q(sort_date=sort_date, pk__gt=pk))
+            else:
+                qs = qs.filter(Q(sort_date__lt=sort_date) | Q(sort_date=sort_date, pk__lt=pk))
+
+        reverse_order = self.descending != backwards
+        ordering = ["-sort_date", "-pk"] if reverse_order else ["sort_date", "pk"]
+        page = list(qs.order_by(*ordering).values_list("pk", "sort_date")[: self.page_size + 1])
+
+        has_more = len(page) > self.page_size
+        page = page[: self.page_size]
+        if backwards:
+            page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+
+        # カードごとの件数・日付の集計は表示する行だけに対して行う
+        seminars = PersonalSeminar.objects.with_summary().in_bulk([pk for pk, _ in page])
+        rows: List[PersonalSeminar] = []
+        for pk, sort_date in page:
+            seminar = seminars[pk]
+            seminar.sort_date = sort_date  # type: ignore[attr-defined]
+            rows.append(seminar)
+        return rows
+
+    def _page_url(self, key: str, seminar: PersonalSeminar) -> str:
+        query = self.list_filter.as_query()
+        query[key] = f"{seminar.sort_date.isoformat()}.{seminar.pk}"  # type: ignore[attr-defined]
+        return "?" + urlencode(query)
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        context: Dict[str, Any] = super().get_context_data(**kwargs)
+        rows: List[PersonalSeminar] = context["object_list"]
+        context.update(
+            {
+                "filter": self.list_filter,
+                "when_choices": SEMINAR_WHEN_CHOICES,
+                "format_choices": PersonalSeminar._meta.get_field("format").choices,
+                "next_url": self._page_url("after", rows[-1]) if rows and self.has_next else None,
+                "previous_url": self._page_url("before", rows[0]) if rows and self.has_previous else None,
+                "first_url": "?" + urlencode(self.list_filter.as_query()),
+            }
+        )
+        return context
 
 
 class PersonalSeminarDetailView(LoginRequiredMixin, DetailView):
     model = PersonalSeminar
     template_name = "seminar/personal_seminar_detail.html"
 
+    def get_queryset(self):
+        return PersonalSeminar.objects.with_dates()
+
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context: Dict[str, Any] = super().get_context_data(**kwargs)
         seminar: PersonalSeminar = context["object"]
 
-        tasks: List[PreparationTask] = list(
-            PreparationTask.objects.filter(seminar=seminar).order_by("deadline", "id")
-        )
-
-        task_grouped_by_dates: Dict[date, List[PreparationTask]] = defaultdict(list)
-        for task in tasks:
-            task_grouped_by_dates[task.deadline].append(task)
-
-        date_summaries: Dict[date, Dict[str, int]] = {}
-        for task_date, related_tasks in task_grouped_by_dates.items():
-            total = len(related_tasks)
-            completed = sum(1 for item in related_tasks if item.is_done)
-            overdue = sum(1 for item in related_tasks if item.is_overdue)
-            percent = round(completed * 100 / total) if total else 0
-            date_summaries[task_date] = {
-                "total": total,
-                "completed": completed,
-                "overdue": overdue,
-                "percent": percent,
+        # タスク一覧・日付ごとの集計・カレンダー用データを1回の走査で作る
+        summary = task_summary_for(seminar.pk)
+        # 件数は集計済みの値を使い、プロパティから再度数えないようにする
+        seminar.annotated_total_tasks = summary.total  # type: ignore[attr-defined]
+        seminar.annotated_completed_tasks = summary.completed  # type: ignore[attr-defined]
+        context.update(
+            {
+                "tasks_by_date": summary.tasks_by_date,
+                "tasks_grouped": summary.tasks_grouped,
+                "date_summaries": summary.date_summaries,
+                "overdue_count": summary.overdue,
+                "pending_count": summary.pending,
+                "calendar_month": self._calendar_month(summary.date_summaries),
             }
+        )
+        return context
 
-        overdue_count = sum(1 for task in tasks if task.is_overdue)
+    @staticmethod
+    def _calendar_month(deadlines: Iterable[date]) -> date:
+        """カレンダーの初期表示月(今日以降で最初の締切、無ければ最初の締切の月)"""
         today = date.today()
-        sorted_grouped_items: List[Tuple[date, List[PreparationTask]]] = sorted(
-            task_grouped_by_dates.items(), key=lambda kv: kv[0]
-        )
+        ordered = sorted(deadlines)
+        focus = next((d for d in ordered if d >= today), ordered[0] if ordered else today)
+        return focus.replace(day=1)
 
-        tasks_grouped = []
-        calendar_events: List[Dict[str, Any]] = []
-        for grouped_date, related_tasks in sorted_grouped_items:
-            ordered_tasks = sorted(related_tasks, key=lambda item: (item.deadline, item.id))  # type: ignore[attr-defined]
-            summary = date_summaries[grouped_date]
-            tasks_grouped.append(
-                {
-                    "date": grouped_date,
-                    "tasks": ordered_tasks,
-                    "summary": summary,
-                    "date_key": grouped_date.isoformat(),
-                    "relative_text": describe_relative_days(grouped_date, today),
-                }
-            )
 
-            calendar_events.append(
+class PersonalSeminarCalendarView(LoginRequiredMixin, View):
+    """詳細画面のカレンダー用に、指定期間の締切日ごとの集計をJSONで返す。
+
+    GET パラメータ start / end (YYYY-MM-DD、両端を含む)。省略時は今月。
+    ETag は期間内のタスク件数と最終更新日時から作り、変更が無ければ 304 を返す。
+    """
+
+    def get(self, request: HttpRequest, pk: int) -> HttpResponse:
+        if not PersonalSeminar.objects.filter(pk=pk).exists():
+            raise Http404
+        start, end, error = self._parse_range(request)
+        if error:
+            return JsonResponse({"success": False, "error": error}, status=400)
+
+        today = date.today()
+        etag = calendar_etag(pk, start, end, today)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(
                 {
-                    "date": grouped_date.isoformat(),
-                    "total": summary["total"],
-                    "completed": summary["completed"],
-                    "overdue": summary["overdue"],
-                    "tasks": [
-                        {
-                            "id": task.id,  # type: ignore[attr-defined]
-                            "name": task.name,
-                            "isDone": task.is_done,
-                            "isOverdue": task.is_overdue,
-                            "deadline": task.deadline.isoformat(),
-                        }
-                        for task in ordered_tasks
-                    ],
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "events": calendar_events_for(pk, start, end, today),
                 }
             )
-
-        context.update(
-            {
-                "tasks_by_date": {k: v for k, v in sorted_grouped_items},
-                "tasks_grouped": tasks_grouped,
-                "date_summaries": date_summaries,
-                "overdue_count": overdue_count,
-                "pending_count": max(
-                    0,
-                    seminar.total_tasks_count
-                    - seminar.completed_tasks_count
-                    - overdue_count,
-                ),
-                "calendar_events": calendar_events,
-            }
-        )
-        return context
+        response["ETag"] = etag
+        # タスクの変更をすぐ反映できるよう、毎回 ETag で再検証させる
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @staticmethod
+    def _parse_range(request: HttpRequest) -> Tuple[date, date, Optional[str]]:
+        month_start = date.today().replace(day=1)
+        month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+        start_raw = request.GET.get("start", "")
+        end_raw = request.GET.get("end", "")
+        start = parse_date_input(start_raw) if start_raw else month_start
+        end = parse_date_input(end_raw) if end_raw else month_end
+        if start is None or end is None:
+            return month_start, month_end, "start / end は YYYY-MM-DD 形式で指定してください"
+        if start > end:
+            return start, end, "start は end 以前の日付を指定してください"
+        if (end - start).days >= CALENDAR_MAX_DAYS:
+            return start, end, f"期間は{CALENDAR_MAX_DAYS}日以内で指定してください"
+        return start, end, None
 
 
 class PersonalSeminarFormMixin:
@@ -140,7 +278,17 @@ class PersonalSeminarFormMixin:
 
         return valid_dates, errors
 
-    def handle_template_tasks(self, seminar: PersonalSeminar) -> None:
+    def save_dates(self, seminar: PersonalSeminar, old_dates: List[date], new_dates: List[date]) -> None:
+        """開催日を差分で保存する(変更の無い行とそのidは残す)"""
+        existing = set(old_dates)
+        removed = existing - set(new_dates)
+        added = [d for d in new_dates if d not in existing]
+        if removed:
+            PersonalSeminarDate.objects.filter(seminar=seminar, date__in=removed).delete()
+        if added:
+            PersonalSeminarDate.objects.bulk_create([PersonalSeminarDate(seminar=seminar, date=d) for d in added])
+
+    def handle_template_tasks(self, seminar: PersonalSeminar, session_dates: List[date]) -> None:
         template_id = self.request.POST.get("template_id")  # type: ignore[attr-defined]
         if not template_id:
             return
@@ -148,7 +296,7 @@ class PersonalSeminarFormMixin:
             template = PreparationTemplate.objects.get(id=template_id)
         except PreparationTemplate.DoesNotExist:
             return
-        create_tasks_from_template(seminar, template)
+        create_tasks_from_template(seminar, template, session_dates)
 
     def form_valid(self, form: BaseModelForm) -> HttpResponse:
         valid_dates, errors = self.validate_posted_dates()
@@ -158,39 +306,64 @@ class PersonalSeminarFormMixin:
             context = self.get_context_data(form=form)
             return self.render_to_response(context)  # type: ignore[attr-defined]
 
-        self.object = form.save()
+        self.save_seminar(form, valid_dates)
+        return HttpResponseRedirect(self.get_success_url())  # type: ignore[attr-defined]
 
+    def save_seminar(self, form: BaseModelForm, valid_dates: List[date]) -> None:
         is_update = isinstance(self, UpdateView)
-        if is_update:
-            self.object.dates.all().delete()
-        for valid_date in valid_dates:
-            PersonalSeminarDate.objects.create(seminar=self.object, date=valid_date)
 
-        if not is_update:
-            self.handle_template_tasks(self.object)
+        # セミナー・開催日・テンプレートからのタスクをまとめて保存する
+        with transaction.atomic():
+            old_dates: List[date] = []
+            if is_update:
+                # 変更前の開催日・基準日の設定(タスクの再計算に使う)。同時編集に備えて行をロックする
+                old_anchor = (
+                    PersonalSeminar.objects.select_for_update()
+                    .values_list("task_anchor", flat=True)
+                    .get(pk=form.instance.pk)
+                )
+                old_dates = list(form.instance.dates.values_list("date", flat=True))
 
-        return HttpResponseRedirect(self.get_success_url())  # type: ignore[attr-defined]
+            self.object = form.save()
+            self.save_dates(self.object, old_dates, valid_dates)
+
+            if is_update:
+                reschedule_tasks(self.object, old_dates, valid_dates, old_anchor)
+            elif valid_dates:
+                self.handle_template_tasks(self.object, valid_dates)
 
 
 class PersonalSeminarCreateView(LoginRequiredMixin, PersonalSeminarFormMixin, CreateView):
     model = PersonalSeminar
-    fields = ["title", "description", "location", "capacity", "price", "format"]
+    fields = ["title", "description", "location", "capacity", "price", "format", "task_anchor"]
     template_name = "seminar/personal_seminar_form.html"
     success_url = reverse_lazy("seminar:seminar_list")
 
 
 class PersonalSeminarUpdateView(LoginRequiredMixin, PersonalSeminarFormMixin, UpdateView):
     model = PersonalSeminar
-    fields = ["title", "description", "location", "capacity", "price", "format"]
+    fields = ["title", "description", "location", "capacity", "price", "format", "task_anchor"]
     template_name = "seminar/personal_seminar_form.html"
     success_url = reverse_lazy("seminar:seminar_list")
 
 
 class PersonalSeminarCopyView(PersonalSeminarCreateView):
+    """開催日・準備タスク・参加者ごとセミナーを複製する。
+
+    開催日を入力した場合は元の開催日と日付順に対応付けてタスクの締切日をずらし
+    (開催日に紐づかないタスクは最も早い開催日の差だけ)、未入力なら date_offset 日だけ
+    元の開催日・タスクの締切日をずらす(ずらした開催日が過去になる場合はエラー。
+    date_offset の初期値は最も早い開催日が今日以降になる週単位の日数)。
+    """
+
+    def get_source(self) -> PersonalSeminar:
+        if not hasattr(self, "_source"):
+            self._source = get_object_or_404(PersonalSeminar.objects.with_dates(), pk=self.kwargs["pk"])
+        return self._source
+
     def get_initial(self) -> Dict[str, Any]:
         initial: Dict[str, Any] = super().get_initial()
-        pk_value = int(self.kwargs["pk"])
-        original_seminar = PersonalSeminar.objects.get(pk=pk_value)
+        original_seminar = self.get_source()
         initial.update(
             {
                 "title": f"{original_seminar.title}（複製）",
@@ -199,6 +372,55 @@ class PersonalSeminarCopyView(PersonalSeminarCreateView):
                 "capacity": original_seminar.capacity,
                 "price": original_seminar.price,
                 "format": original_seminar.format,
+                "task_anchor": original_seminar.task_anchor,
             }
         )
         return initial
+
+    def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
+        context: Dict[str, Any] = super().get_context_data(**kwargs)
+        context["copy_source"] = self.get_source()
+        context["default_date_offset"] = self.default_date_offset()
+        return context
+
+    def default_date_offset(self) -> int:
+        """最も早い開催日が今日より前にならない日数(曜日が変わらないよう週単位)。未来の開催なら0"""
+        first_date = self.get_source().base_date()
+        if first_date is None or first_date >= date.today():
+            return 0
+        return -(-(date.today() - first_date).days // 7) * 7
+
+    def form_valid(self, form: BaseModelForm) -> HttpResponse:
+        raw_offset = (self.request.POST.get("date_offset") or "").strip()
+        try:
+            self.date_offset = int(raw_offset) if raw_offset else self.default_date_offset()
+        except ValueError:
+            form.add_error(None, f"ずらす日数は整数で入力してください: {raw_offset}")
+            return self.render_to_response(self.get_context_data(form=form))
+        if not any(self.request.POST.getlist("dates[]")):
+            # 開催日を入力しない場合は、ずらした後の開催日も入力時と同じく過去日付を認めない
+            offset = timedelta(days=self.date_offset)
+            shifted = [d + offset for d in self.get_source().dates.values_list("date", flat=True)]  # type: ignore[attr-defined]
+            past = [d for d in shifted if d < date.today()]
+            if past:
+                form.add_error(
+                    None,
+                    f"ずらした開催日が過去日付になります: {min(past)}"
+                    f"(ずらす日数を増やす(例: {self.default_date_offset()}日)か、開催日を入力してください)",
+                )
+                return self.render_to_response(self.get_context_data(form=form))
+        return super().form_valid(form)
+
+    def save_seminar(self, form: BaseModelForm, valid_dates: List[date]) -> None:
+        source = self.get_source()
+        first_date = source.base_date()
+        offset_days = self.date_offset
+        if valid_dates and first_date:
+            offset_days = (min(valid_dates) - first_date).days
+        self.object = clone_seminar(
+            source,
+            offset_days,
+            reset_done=self.request.POST.get("reset_done") == "1",
+            target=form.instance,
+            session_dates=valid_dates or None,
+        )
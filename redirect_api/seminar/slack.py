@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import http.client
+import json
+import select
+import ssl
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    import certifi  # type: ignore
+    _CERTIFI_CA = certifi.where()
+except Exception:  # certifi 未インストール時はデフォルトCAを使用
+    certifi = None  # type: ignore
+    _CERTIFI_CA = None
+
+
+@lru_cache(maxsize=1)
+def ssl_context() -> ssl.SSLContext:
+    """全送信で共有する SSL コンテキスト(CA バンドルの読み込みは1回だけ)"""
+    # certifi があればその CA バンドルを使用
+    return ssl.create_default_context(cafile=_CERTIFI_CA) if _CERTIFI_CA else ssl.create_default_context()
+
+
+# 429 に Retry-After が無い場合に同じホストへの送信を止める秒数
+RATE_LIMIT_DEFAULT_WAIT = 30.0
+
+
+@dataclass
+class SlackMessage:
+    url: str
+    text: str
+    blocks: Optional[List[Dict[str, Any]]] = None
+    # ログ表示用のラベル
+    label: str = ""
+    # ダイジェストに含めた section の番号(build_digest に渡した順)
+    sources: Tuple[int, ...] = ()
+
+    def payload(self) -> bytes:
+        data: Dict[str, Any] = {"text": self.text}
+        if self.blocks:
+            data["blocks"] = self.blocks
+        return json.dumps(data).encode("utf-8")
+
+
+@dataclass
+class DeliveryResult:
+    message: SlackMessage
+    ok: bool
+    status: Optional[int] = None
+    # 429 の Retry-After(秒)
+    retry_after: Optional[float] = None
+    error: str = ""
+    elapsed: float = 0.0
+
+
+@dataclass
+class SlackDelivery:
+    """Slack Incoming Webhook への並行送信。
+
+    - 上限付きのスレッドプールで送信し、ホストごとの同時接続数も制限する
+    - スレッド・ホストごとに keep-alive の接続を使い回し、SSL コンテキストは共有する
+    - deadline 秒を過ぎたら未送信のメッセージは送らずに失敗として返す
+    - 429 を受けたホストへは Retry-After の間、以降のメッセージを送らずに失敗として返す
+    実行時間は合計ではなく、最も遅い1件(と並行数)で決まる。
+    """
+
+    max_workers: int = 8
+    max_per_host: int = 4
+    timeout: float = 10.0
+    deadline: float = 120.0
+
+    _local: threading.local = field(default_factory=threading.local, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _host_slots: Dict[str, threading.BoundedSemaphore] = field(default_factory=dict, init=False, repr=False)
+    _connections: List[http.client.HTTPConnection] = field(default_factory=list, init=False, repr=False)
+    # 429 を受けたホストと、送信を再開してよい時刻(monotonic)
+    _rate_limited: Dict[str, float] = field(default_factory=dict, init=False, repr=False)
+
+    def deliver(self, messages: Iterable[SlackMessage]) -> List[DeliveryResult]:
+        """メッセージを送信し、渡した順に結果を返す"""
+        messages = list(messages)
+        if not messages:
+            return []
+        expires_at = time.monotonic() + self.deadline
+        results: List[Optional[DeliveryResult]] = [None] * len(messages)
+        pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(messages))), thread_name_prefix="slack")
+        try:
+            futures = {pool.submit(self._send, message, expires_at): index for index, message in enumerate(messages)}
+            pending = set(futures)
+            while pending:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+            for future in pending:
+                future.cancel()
+        finally:
+            # 締切を過ぎた送信は待たない(接続を閉じてタイムアウトさせる)
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.close()
+        return [
+            result or DeliveryResult(message=message, ok=False, error="deadline exceeded")
+            for message, result in zip(messages, results)
+        ]
+
+    def send_one(self, message: SlackMessage) -> DeliveryResult:
+        try:
+            return self._send(message, time.monotonic() + self.deadline)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def _send(self, message: SlackMessage, expires_at: float) -> DeliveryResult:
+        started = time.monotonic()
+        try:
+            parts = urlsplit(message.url)
+            parts.port  # 不正なポート番号はここで ValueError になる
+        except ValueError:
+            return DeliveryResult(message=message, ok=False, error="invalid webhook url")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return DeliveryResult(message=message, ok=False, error="invalid webhook url")
+        host_key = f"{parts.scheme}://{parts.netloc}"
+
+        slot = self._slot(host_key)
+        if not slot.acquire(timeout=max(0.0, expires_at - time.monotonic())):
+            return DeliveryResult(message=message, ok=False, error="deadline exceeded")
+        try:
+            # 同じホストで 429 を受けたら Retry-After までは送らない
+            skipped = self._rate_limit_result(host_key, message)
+            if skipped is not None:
+                return skipped
+            timeout = min(self.timeout, expires_at - time.monotonic())
+            if timeout <= 0:
+                return DeliveryResult(message=message, ok=False, error="deadline exceeded")
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            status, retry_after = self._post(host_key, parts, path, message.payload(), timeout)
+        except (OSError, http.client.HTTPException) as e:
+            return DeliveryResult(message=message, ok=False, error=str(e) or type(e).__name__, elapsed=time.monotonic() - started)
+        finally:
+            slot.release()
+        if status == 429:
+            wait_seconds = retry_after if retry_after is not None else RATE_LIMIT_DEFAULT_WAIT
+            with self._lock:
+                self._rate_limited[host_key] = time.monotonic() + wait_seconds
+        return DeliveryResult(
+            message=message,
+            ok=200 <= status < 300,
+            status=status,
+            retry_after=retry_after,
+            error="" if 200 <= status < 300 else f"HTTP {status}",
+            elapsed=time.monotonic() - started,
+        )
+
+    def _post(self, host_key: str, parts, path: str, body: bytes, timeout: float) -> Tuple[int, Optional[float]]:
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in (1, 2):
+            conn = self._connection(host_key, parts, timeout)
+            reused = conn.sock is not None
+            sent = False
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                sent = True
+                resp = conn.getresponse()
+                resp.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._drop(host_key, conn)
+                # サーバー側で閉じられていた keep-alive 接続への書き込みに失敗した場合だけ張り直す
+                # (送信済みの後に切れた場合は届いている可能性があるため、二重投稿を避けて再送しない)
+                if attempt == 2 or sent or not reused:
+                    raise
+                continue
+            except Exception:
+                self._drop(host_key, conn)
+                raise
+            if resp.will_close:
+                self._drop(host_key, conn)
+            return resp.status, _parse_retry_after(resp.getheader("Retry-After"))
+        raise http.client.HTTPException("unreachable")
+
+    def _rate_limit_result(self, host_key: str, message: SlackMessage) -> Optional[DeliveryResult]:
+        with self._lock:
+            until = self._rate_limited.get(host_key)
+        remaining = until - time.monotonic() if until is not None else 0.0
+        if remaining <= 0:
+            return None
+        return DeliveryResult(message=message, ok=False, retry_after=remaining, error="rate limited (not sent)")
+
+    def _slot(self, host_key: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._host_slots.get(host_key)
+            if slot is None:
+                slot = self._host_slots[host_key] = threading.BoundedSemaphore(max(1, self.max_per_host))
+            return slot
+
+    def _connection(self, host_key: str, parts, timeout: float) -> http.client.HTTPConnection:
+        connections: Dict[str, http.client.HTTPConnection] = self._local.__dict__.setdefault("connections", {})
+        conn = connections.get(host_key)
+        if conn is not None and _peer_closed(conn):
+            # サーバー側で閉じられた keep-alive 接続は送信前に捨てる
+            self._drop(host_key, conn)
+            conn = None
+        if conn is None:
+            if parts.scheme == "https":
+                conn = http.client.HTTPSConnection(parts.hostname, parts.port, timeout=timeout, context=ssl_context())
+            else:
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+            connections[host_key] = conn
+            with self._lock:
+                self._connections.append(conn)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _drop(self, host_key: str, conn: http.client.HTTPConnection) -> None:
+        conn.close()
+        self._local.__dict__.get("connections", {}).pop(host_key, None)
+
+
+def _peer_closed(conn: http.client.HTTPConnection) -> bool:
+    """待機中の接続が読み込み可能(切断の通知・想定外のデータ)なら再利用しない"""
+    if conn.sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([conn.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    if not readable:
+        return False
+    # TLS では制御レコード(セッションチケット等)だけで読み込み可能になるため、実際に読んで確かめる
+    try:
+        conn.sock.setblocking(False)
+        conn.sock.recv(1)
+    except (ssl.SSLWantReadError, BlockingIOError):
+        return False
+    except OSError:
+        return True
+    finally:
+        try:
+            conn.sock.settimeout(conn.timeout)
+        except OSError:
+            pass
+    # 切断(b"")・想定外のデータ
+    return True
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+# Block Kit の上限(1メッセージのブロック数 / section の文字数)
+SLACK_MAX_BLOCKS = 50
+SLACK_SECTION_MAX_CHARS = 3000
+# 通知に表示される text(フォールバック)の長さ
+SLACK_FALLBACK_MAX_CHARS = 300
+
+
+def _split_section(text: str, limit: int = SLACK_SECTION_MAX_CHARS) -> List[str]:
+    """section の上限を超える本文を行単位で分割する(1行が長すぎる場合は文字数で切る)"""
+    chunks: List[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            candidate = line
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_digest(url: str, title: str, sections: Iterable[str], label: str = "") -> List[SlackMessage]:
+    """複数の通知をまとめた Block Kit のダイジェストを作る。
+
+    各 section は区切り線で区切り、ブロック数・文字数の上限を超える場合は
+    複数のメッセージに分割する(2通目以降の見出しには (2/3) のように番号を付ける)。
+    """
+    bodies = [(index, chunk) for index, section in enumerate(sections) for chunk in _split_section(section)]
+    # 見出し1つ + section n 個 + 区切り線 n-1 個 が上限に収まる数
+    per_message = SLACK_MAX_BLOCKS // 2
+    pages = [bodies[i:i + per_message] for i in range(0, len(bodies), per_message)] or [[]]
+
+    messages: List[SlackMessage] = []
+    for number, page in enumerate(pages, start=1):
+        heading = title if len(pages) == 1 else f"{title} ({number}/{len(pages)})"
+        blocks: List[Dict[str, Any]] = [{"type": "header", "text": {"type": "plain_text", "text": heading[:150]}}]
+        for position, (_, body) in enumerate(page):
+            if position:
+                blocks.append({"type": "divider"})
+            blocks.append({"type": "section", "text": {"type": "mrkdwn", "text": body}})
+        fallback = f"{heading}\n" + "\n".join(body for _, body in page)
+        if len(fallback) > SLACK_FALLBACK_MAX_CHARS:
+            fallback = fallback[: SLACK_FALLBACK_MAX_CHARS - 1] + "…"
+        sources = tuple(dict.fromkeys(index for index, _ in page))
+        messages.append(SlackMessage(url=url, text=fallback, blocks=blocks, label=label, sources=sources))
+    return messages
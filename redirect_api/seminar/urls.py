@@ -2,6 +2,7 @@ from django.urls import path
 from .seminar_view import (
     PersonalSeminarListView,
     PersonalSeminarDetailView,
+    PersonalSeminarCalendarView,
     PersonalSeminarCreateView,
     PersonalSeminarUpdateView,
     PersonalSeminarCopyView,
@@ -10,11 +11,13 @@ from .preparation_view import (
     ToggleTaskAjaxView,
     UpdateTaskAjaxView,
     CreateTaskAjaxView,
+    BatchTaskAjaxView,
     TemplateListView,
     TemplateCreateView,
     TemplateUpdateView,
     TemplateDeleteView,
     TemplateCopyView,
+    TemplateMergeView,
     TaskTemplateCreateAjaxView,
     TaskTemplateUpdateAjaxView,
     TaskTemplateDeleteAjaxView,
@@ -31,10 +34,12 @@ app_name = "seminar"
 urlpatterns = [
     path("", PersonalSeminarListView.as_view(), name="seminar_list"),
     path("<int:pk>/", PersonalSeminarDetailView.as_view(), name="seminar_detail"),
+    path("<int:pk>/calendar.json", PersonalSeminarCalendarView.as_view(), name="seminar_calendar"),
     path("create/", PersonalSeminarCreateView.as_view(), name="seminar_create"),
     path("<int:pk>/update/", PersonalSeminarUpdateView.as_view(), name="seminar_update"),
     path("<int:pk>/copy/", PersonalSeminarCopyView.as_view(), name="copy"),
     path("<int:seminar_id>/tasks/create-ajax/", CreateTaskAjaxView.as_view(), name="create_task_ajax"),
+    path("<int:seminar_id>/tasks/batch/", BatchTaskAjaxView.as_view(), name="batch_task_ajax"),
     path("tasks/<int:pk>/toggle-ajax/", ToggleTaskAjaxView.as_view(), name="toggle_task_ajax"),
     path("tasks/<int:pk>/update-ajax/", UpdateTaskAjaxView.as_view(), name="update_task_ajax"),
     path("templates/", TemplateListView.as_view(), name="template_list"),
@@ -42,6 +47,7 @@ urlpatterns = [
     path("templates/<int:pk>/update/", TemplateUpdateView.as_view(), name="template_update"),
     path("templates/<int:pk>/delete/", TemplateDeleteView.as_view(), name="template_delete"),
     path("templates/<int:pk>/copy/", TemplateCopyView.as_view(), name="template_copy"),
+    path("templates/merge/", TemplateMergeView.as_view(), name="template_merge"),
     path("templates/<int:template_id>/tasks/create-ajax/", TaskTemplateCreateAjaxView.as_view(), name="task_template_create_ajax"),
     path("templates/tasks/<int:pk>/update-ajax/", TaskTemplateUpdateAjaxView.as_view(), name="task_template_update_ajax"),
     path("templates/tasks/<int:pk>/delete-ajax/", TaskTemplateDeleteAjaxView.as_view(), name="task_template_delete_ajax"),
@@ -1,23 +1,14 @@
 from __future__ import annotations
 
-from datetime import date, datetime, timedelta
-from typing import TYPE_CHECKING, Any, Dict, Optional
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
 
+from django.db.models import Count, Max, Q
 from django.utils.dateparse import parse_date
-from django.conf import settings
-
-import json
-import urllib.request
-import urllib.error
-import ssl
-try:
-    import certifi  # type: ignore
-    _CERTIFI_CA = certifi.where()
-except Exception:  # certifi 未インストール時はデフォルトCAを使用
-    certifi = None  # type: ignore
-    _CERTIFI_CA = None
 
 from .models import PreparationTask
+from .scheduling import generate_tasks
 
 if TYPE_CHECKING:
     from .models import PreparationTemplate, PersonalSeminar as Seminar
@@ -26,25 +17,20 @@ if TYPE_CHECKING:
 WEEKDAYS: list[str] = ["月", "火", "水", "木", "金", "土", "日"]
 
 
-def create_tasks_from_template(seminar: "Seminar", template: "PreparationTemplate") -> None:
-    """Seminar作成時にPreparationTaskTemplateからPreparationTaskを生成"""
-    base_date = seminar.base_date()
-    if not base_date:
-        return  # SeminarDateがない場合はスキップ
-
-    for task_template in template.tasks.all():  # type: ignore[attr-defined]
-        # 相対日のみを利用
-        if task_template.relative_days_before is None:
-            continue  # 日付がないタスクはスキップ
-
-        deadline = base_date + timedelta(days=task_template.relative_days_before)
-        PreparationTask.objects.create(
-            seminar=seminar,
-            name=task_template.name,
-            deadline=deadline,
-            assignee=task_template.default_assignee,
-            notes=task_template.default_notes,
-        )
+def create_tasks_from_template(
+    seminar: "Seminar", template: "PreparationTemplate", session_dates: Optional[Iterable[date]] = None
+) -> List[PreparationTask]:
+    """Seminar作成時にPreparationTaskTemplateからPreparationTaskを生成
+
+    session_dates を省略した場合は登録済みの開催日を使う。
+    基準にする開催日(最初のみ/各開催日)は seminar.task_anchor に従う。
+    """
+    if session_dates is None:
+        session_dates = seminar.dates.values_list("date", flat=True)  # type: ignore[attr-defined]
+    dates = list(session_dates)
+    if not dates:
+        return []  # SeminarDateがない場合はスキップ
+    return generate_tasks({seminar: dates}, template)
 
 
 def parse_date_input(value: str) -> Optional[date]:
@@ -53,13 +39,12 @@ def parse_date_input(value: str) -> Optional[date]:
     if not value:
         return None
 
-    parsed = parse_date(value)
-    if parsed is not None:
-        return parsed
-
     try:
+        parsed = parse_date(value)
+        if parsed is not None:
+            return parsed
         return datetime.strptime(value, "%Y-%m-%d").date()
-    except ValueError:
+    except ValueError:  # 形式は正しいが存在しない日付(2月30日など)も含む
         return None
 
 
@@ -91,27 +76,124 @@ def serialize_task(task: PreparationTask) -> Dict[str, Any]:
         "date_key": deadline.isoformat(),
         "relative_text": describe_relative_days(deadline),
         "is_overdue": task.is_overdue,
+        "version": task.version,
     }
 
 
-def post_to_slack(text: str, *, webhook_url: Optional[str] = None, blocks: Optional[list[dict]] = None) -> bool:
-    """Slack Incoming Webhook に投稿。失敗しても例外を外に投げず False を返す。
-    依存を最小化するため標準ライブラリで送信。
+# 集計・表示に使うタスクの項目(values() で取得)
+TASK_SUMMARY_FIELDS: tuple[str, ...] = ("id", "name", "deadline", "assignee", "notes", "is_done")
+
+
+@dataclass
+class TaskSummary:
+    """締切日ごとのタスク集計(詳細画面用)"""
+
+    tasks_grouped: List[Dict[str, Any]] = field(default_factory=list)
+    date_summaries: Dict[date, Dict[str, int]] = field(default_factory=dict)
+    total: int = 0
+    completed: int = 0
+    overdue: int = 0
+
+    @property
+    def pending(self) -> int:
+        return max(0, self.total - self.completed - self.overdue)
+
+    @property
+    def tasks_by_date(self) -> Dict[date, List[Dict[str, Any]]]:
+        return {group["date"]: group["tasks"] for group in self.tasks_grouped}
+
+
+def build_task_summary(rows: Iterable[Dict[str, Any]], today: Optional[date] = None) -> TaskSummary:
+    """(deadline, id) 順に並んだタスクの辞書を1回だけ走査して集計する。
+
+    各行には is_overdue を追加する。期限超過の判定は同じ today を使う。
     """
-    url = webhook_url or getattr(settings, 'SLACK_TASK_WEBHOOK_URL', None)
-    if not url:
-        return False
-
-    payload: Dict[str, Any] = {"text": text}
-    if blocks:
-        payload["blocks"] = blocks
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
-    try:
-        # certifi があればその CA バンドルを使用
-        context = ssl.create_default_context(cafile=_CERTIFI_CA) if _CERTIFI_CA else ssl.create_default_context()
-        with urllib.request.urlopen(req, timeout=10, context=context) as resp:
-            return 200 <= resp.status < 300
-    except (urllib.error.URLError, urllib.error.HTTPError) as e:
-        print(e)
-        return False
+    today = today or date.today()
+    result = TaskSummary()
+    summary: Dict[str, int] = {}
+    current: Optional[date] = None
+
+    for row in rows:
+        deadline: date = row["deadline"]
+        is_done = bool(row["is_done"])
+        is_overdue = (not is_done) and deadline < today
+        row["is_overdue"] = is_overdue
+
+        if deadline != current:
+            current = deadline
+            summary = {"total": 0, "completed": 0, "overdue": 0, "percent": 0}
+            result.date_summaries[deadline] = summary
+            result.tasks_grouped.append(
+                {
+                    "date": deadline,
+                    "tasks": [],
+                    "summary": summary,
+                    "date_key": deadline.isoformat(),
+                    "relative_text": describe_relative_days(deadline, today),
+                }
+            )
+
+        result.tasks_grouped[-1]["tasks"].append(row)
+        summary["total"] += 1
+        summary["completed"] += is_done
+        summary["overdue"] += is_overdue
+        summary["percent"] = round(summary["completed"] * 100 / summary["total"])
+
+    for group in result.tasks_grouped:
+        result.total += group["summary"]["total"]
+        result.completed += group["summary"]["completed"]
+        result.overdue += group["summary"]["overdue"]
+    return result
+
+
+def task_summary_for(seminar_id: int, today: Optional[date] = None) -> TaskSummary:
+    """セミナーのタスクを1クエリで取得して集計する"""
+    rows = (
+        PreparationTask.objects.filter(seminar_id=seminar_id)
+        .order_by("deadline", "id")
+        .values(*TASK_SUMMARY_FIELDS)
+    )
+    return build_task_summary(rows, today)
+
+
+# カレンダーAPIで一度に取得できる最大日数(6週表示の前後数か月分)
+CALENDAR_MAX_DAYS = 186
+
+
+def calendar_etag(seminar_id: int, start: date, end: date, today: Optional[date] = None) -> str:
+    """期間内のタスク件数と最終更新日時からカレンダーのETagを作る。
+
+    期限超過の判定が日付で変わるため today も含める。
+    """
+    today = today or date.today()
+    stats = PreparationTask.objects.filter(
+        seminar_id=seminar_id, deadline__range=(start, end)
+    ).aggregate(count=Count("id"), last_updated=Max("updated_at"))
+    last_updated = stats["last_updated"]
+    stamp = int(last_updated.timestamp() * 1000) if last_updated else 0
+    return f'"{stats["count"]}-{stamp}-{today:%Y%m%d}"'
+
+
+def calendar_events_for(seminar_id: int, start: date, end: date, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """期間内のタスクを締切日ごとに集計したカレンダー用のイベントを返す"""
+    today = today or date.today()
+    rows = (
+        PreparationTask.objects.filter(seminar_id=seminar_id, deadline__range=(start, end))
+        .values("deadline")
+        .annotate(
+            total=Count("id"),
+            completed=Count("id", filter=Q(is_done=True)),
+            overdue=Count("id", filter=Q(is_done=False, deadline__lt=today)),
+        )
+        .order_by("deadline")
+    )
+    return [
+        {
+            "date": row["deadline"].isoformat(),
+            "total": row["total"],
+            "completed": row["completed"],
+            "overdue": row["overdue"],
+        }
+        for row in rows
+    ]
+
@@ -12,38 +12,33 @@
   $(document).ready(function() {
     const storageKey = 'seminar_detail_open_dates';
 
-    const calendarScript = document.getElementById('seminar-calendar-data');
-    let calendarEvents = [];
-    if (calendarScript && calendarScript.textContent) {
-      try {
-        calendarEvents = JSON.parse(calendarScript.textContent);
-      } catch (error) {
-        console.warn('Failed to parse calendar data', error);
-      }
-    }
-
     const calendarRoot = document.querySelector('[data-calendar-root]');
     const calendarGrid = calendarRoot ? calendarRoot.querySelector('[data-calendar-grid]') : null;
     const calendarLabel = document.querySelector('[data-calendar-label]');
     const calendarPrev = document.querySelector('.calendar-nav-prev');
     const calendarNext = document.querySelector('.calendar-nav-next');
+    const calendarUrl = calendarRoot ? calendarRoot.dataset.calendarUrl : null;
 
-    const eventMap = new Map();
-    calendarEvents.forEach((event) => {
-      eventMap.set(event.date, event);
-    });
+    // 表示中の期間のイベントだけを保持する（月の移動ごとにAPIから取得）
+    let eventMap = new Map();
+    let calendarRequestId = 0;
+
+    // toISOString() はUTCに変換されるため、ローカル日付で YYYY-MM-DD を作る
+    function toIsoDate(dateObj) {
+      const month = String(dateObj.getMonth() + 1).padStart(2, '0');
+      const day = String(dateObj.getDate()).padStart(2, '0');
+      return `${dateObj.getFullYear()}-${month}-${day}`;
+    }
 
     const todayDate = new Date();
+    const todayIso = toIsoDate(todayDate);
     const initialDate = (() => {
-      if (calendarEvents.length === 0) {
-        return new Date(todayDate.getFullYear(), todayDate.getMonth(), 1);
+      const raw = calendarRoot ? calendarRoot.dataset.calendarMonth : '';
+      if (raw) {
+        const [year, month] = raw.split('-').map(Number);
+        return new Date(year, month - 1, 1);
       }
-      const sortable = calendarEvents
-        .map((event) => event.date)
-        .sort();
-      const focus = sortable.find((d) => d >= todayDate.toISOString().slice(0, 10)) || sortable[0];
-      const [year, month] = focus.split('-').map(Number);
-      return new Date(year, month - 1, 1);
+      return new Date(todayDate.getFullYear(), todayDate.getMonth(), 1);
     })();
 
     let currentMonth = initialDate;
@@ -55,7 +50,7 @@
     }
 
     function buildCell(dateObj, inCurrentMonth) {
-      const iso = dateObj.toISOString().slice(0, 10);
+      const iso = toIsoDate(dateObj);
       const event = eventMap.get(iso);
       const button = document.createElement('button');
       button.type = 'button';
@@ -68,7 +63,7 @@
         button.classList.add('border-gray-200', 'hover:border-primary-300', 'hover:bg-primary-50/50');
       }
 
-      if (iso === todayDate.toISOString().slice(0, 10)) {
+      if (iso === todayIso) {
         button.classList.add('ring-2', 'ring-primary-300');
       }
 
@@ -98,17 +93,15 @@
       return button;
     }
 
-    function renderCalendar(monthDate) {
-      if (!calendarRoot || !calendarGrid || !calendarLabel) {
-        return;
-      }
+    function calendarGridStart(monthDate) {
+      const firstDay = new Date(monthDate.getFullYear(), monthDate.getMonth(), 1);
+      return new Date(firstDay.getFullYear(), firstDay.getMonth(), 1 - firstDay.getDay());
+    }
 
+    function drawCalendar(monthDate) {
       calendarGrid.innerHTML = '';
-      const year = monthDate.getFullYear();
       const month = monthDate.getMonth();
-      const firstDay = new Date(year, month, 1);
-      const startOffset = firstDay.getDay();
-      const gridStart = new Date(year, month, 1 - startOffset);
+      const gridStart = calendarGridStart(monthDate);
 
       for (let i = 0; i < 42; i += 1) {
         const cellDate = new Date(gridStart.getFullYear(), gridStart.getMonth(), gridStart.getDate() + i);
@@ -118,10 +111,38 @@
       }
 
       calendarLabel.textContent = formatMonthLabel(monthDate);
-      const emptyMessage = calendarGrid.querySelector('[data-calendar-empty]');
-      if (emptyMessage) {
-        emptyMessage.remove();
+    }
+
+    function renderCalendar(monthDate) {
+      if (!calendarRoot || !calendarGrid || !calendarLabel) {
+        return;
+      }
+
+      drawCalendar(monthDate);
+      if (!calendarUrl) {
+        return;
       }
+
+      // 表示中の6週間分だけ取得する（ETagで再検証されるため未変更なら304）
+      const gridStart = calendarGridStart(monthDate);
+      const gridEnd = new Date(gridStart.getFullYear(), gridStart.getMonth(), gridStart.getDate() + 41);
+      const requestId = ++calendarRequestId;
+      $.ajax({
+        url: calendarUrl,
+        method: 'GET',
+        dataType: 'json',
+        data: { start: toIsoDate(gridStart), end: toIsoDate(gridEnd) },
+        success: function(res) {
+          if (requestId !== calendarRequestId) {
+            return; // 先に別の月へ移動済み
+          }
+          eventMap = new Map((res.events || []).map((event) => [event.date, event]));
+          drawCalendar(monthDate);
+        },
+        error: function() {
+          console.warn('Failed to load calendar events');
+        }
+      });
     }
 
     function scrollToDateSection(dateIso) {
@@ -272,65 +293,101 @@
       checkbox.prop('checked', newState).trigger('change');
     });
 
-    // Task toggle via Ajax
-    $(document).on('change', '.task-checkbox', function() {
-      const $cb = $(this);
-      const taskId = $cb.data('task-id');
-      const isCompleted = $cb.is(':checked');
-      const taskItem = $cb.closest('.task-item');
+    function applyTaskState(taskItem, isCompleted, isOverdue) {
       const taskTitle = taskItem.find('h4');
       const taskDescription = taskItem.find('p').first();
+      taskItem.removeClass('task-completed task-pending task-overdue');
+      if (isCompleted) {
+        taskItem.addClass('task-completed');
+        taskTitle.addClass('line-through');
+        taskDescription.addClass('line-through');
+      } else {
+        taskItem.addClass(isOverdue ? 'task-overdue' : 'task-pending');
+        taskTitle.removeClass('line-through');
+        taskDescription.removeClass('line-through');
+      }
+    }
+
+    // 連続したチェック操作は短い間隔でまとめ、バッチAPIへ1リクエストで送る
+    const TOGGLE_BATCH_DELAY = 300;
+    const pendingDone = new Map();
+    let toggleTimer = null;
+
+    function flushToggles(unloading) {
+      toggleTimer = null;
+      if (pendingDone.size === 0) return;
+      const seminarId = $('[data-seminar-id]').first().data('seminar-id');
+      const sent = new Map(pendingDone);
+      pendingDone.clear();
+      const operations = Array.from(sent, ([id, isDone]) => ({ op: 'set_done', id: id, is_done: isDone }));
+      const url = `/seminars/${seminarId}/tasks/batch/`;
+      const body = JSON.stringify({ operations: operations });
+
+      if (unloading) {
+        // ページを離れる途中でも送信が打ち切られないよう keepalive で送る(応答は待たない)
+        const headers = { 'Content-Type': 'application/json' };
+        if (csrftoken) headers['X-CSRFToken'] = csrftoken;
+        fetch(url, { method: 'POST', keepalive: true, credentials: 'same-origin', headers: headers, body: body })
+          .catch((error) => console.error('Batch flush error:', error));
+        return;
+      }
 
-      // loading state
-      $cb.prop('disabled', true);
+      function revert(message) {
+        sent.forEach((isDone, id) => {
+          // 送信後に再度操作されたタスクはそのままにする
+          if (!pendingDone.has(id)) {
+            $(`.task-checkbox[data-task-id="${id}"]`).prop('checked', !isDone);
+          }
+        });
+        alert(message);
+      }
 
       $.ajax({
-        url: `/seminars/tasks/${taskId}/toggle-ajax/`,
+        url: url,
         method: 'POST',
+        contentType: 'application/json',
         headers: csrftoken ? { 'X-CSRFToken': csrftoken } : {},
-        data: {
-          task_id: taskId,
-          is_completed: isCompleted
-        },
+        data: body,
         success: function(response) {
-          if (response && response.success) {
-            // Update styles
-            taskItem.removeClass('task-completed task-pending task-overdue');
-            if (isCompleted) {
-              taskItem.addClass('task-completed');
-              taskTitle.addClass('line-through');
-              taskDescription.addClass('line-through');
-            } else {
-              if (response.is_overdue) {
-                taskItem.addClass('task-overdue');
-              } else {
-                taskItem.addClass('task-pending');
-              }
-              taskTitle.removeClass('line-through');
-              taskDescription.removeClass('line-through');
-            }
+          if (!(response && response.success)) {
+            revert('エラーが発生しました: ' + ((response && response.error) || '不明なエラー'));
+            return;
+          }
+          const groups = new Set();
+          response.results.forEach((result) => {
+            if (pendingDone.has(result.pk)) return;
+            const taskItem = $(`.task-checkbox[data-task-id="${result.pk}"]`).closest('.task-item');
+            applyTaskState(taskItem, result.is_done, result.is_overdue);
 
             // Tiny animation
             taskItem.addClass('animate-pulse');
             setTimeout(() => taskItem.removeClass('animate-pulse'), 500);
-
-            const $group = taskItem.closest('[data-date-key]');
-            updateGroupCounts($group);
-            updateGlobalProgress();
-          } else {
-            alert('エラーが発生しました: ' + ((response && response.error) || '不明なエラー'));
-            $cb.prop('checked', !isCompleted);
-          }
+            groups.add(taskItem.closest('[data-date-key]').get(0));
+          });
+          groups.forEach((group) => updateGroupCounts($(group)));
+          updateGlobalProgress();
         },
         error: function(xhr, status, error) {
           console.error('Ajax error:', error);
-          alert('通信エラーが発生しました。再度お試しください。');
-          $cb.prop('checked', !isCompleted);
-        },
-        complete: function() {
-          $cb.prop('disabled', false);
+          revert('通信エラーが発生しました。再度お試しください。');
         }
       });
+    }
+
+    // Task toggle via batch API
+    $(document).on('change', '.task-checkbox', function() {
+      const $cb = $(this);
+      pendingDone.set(Number($cb.data('task-id')), $cb.is(':checked'));
+      if (toggleTimer) clearTimeout(toggleTimer);
+      toggleTimer = setTimeout(() => flushToggles(false), TOGGLE_BATCH_DELAY);
+    });
+
+    // 未送信の操作はページを離れる前に送る
+    window.addEventListener('pagehide', () => {
+      if (toggleTimer) {
+        clearTimeout(toggleTimer);
+        flushToggles(true);
+      }
     });
 
     // -------- Inline Edit: start/cancel/save --------